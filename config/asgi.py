@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# 🔥 Precarga URLs, plantillas y catálogo antes de aceptar tráfico
+from productos.arranque import calentamiento_activo, calentar  # noqa: E402
+
+if calentamiento_activo():
+    calentar()
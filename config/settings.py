@@ -38,9 +38,9 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
 
-    # ✅ Cloudinary (MEDIA)
-    "cloudinary_storage",
-    "cloudinary",
+    # ✅ Cloudinary (MEDIA): no se registran "cloudinary" ni
+    # "cloudinary_storage" como apps. El storage (ver STORAGES) funciona
+    # igual y el SDK se importa hasta la primera URL de imagen, no al arrancar.
 
     "productos",
 ]
@@ -59,8 +59,15 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# 📊 Solo para pruebas de carga: header X-DB-Queries en cada respuesta
+if os.environ.get("CONTAR_CONSULTAS", "").lower() in ("1", "true", "yes"):
+    MIDDLEWARE.insert(0, "productos.middleware.ContadorConsultasMiddleware")
+
 ROOT_URLCONF = "config.urls"
 
+# 📈 Eventos del embudo (JSONL de solo-agregar); vacío = desactivado
+EVENTOS_ARCHIVO = os.environ.get("EVENTOS_ARCHIVO", str(BASE_DIR / "eventos.jsonl"))
+
 # =========================
 # TEMPLATES
 # =========================
@@ -93,6 +100,11 @@ if not DATABASE_URL:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # Escrituras concurrentes (checkout en varios hilos) esperan su turno
+            # en vez de fallar con "database is locked"
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+            # Archivo y no memoria: las pruebas con hilos comparten la base
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 else:
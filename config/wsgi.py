@@ -3,4 +3,10 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# 🔥 Precarga URLs, plantillas y catálogo antes de aceptar tráfico
+from productos.arranque import calentamiento_activo, calentar  # noqa: E402
+
+if calentamiento_activo():
+    calentar()
@@ -1,8 +1,64 @@
-from django.contrib import admin
-from django.urls import reverse
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Max, Min, Sum
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
 
-from .models import Producto, Pedido, PedidoItem
+from .clientes import normalizar_telefono
+from .edicion_masiva import DE_STOCK, aplicar, vista_previa
+from .estados import aplicar_transicion, puede_transicionar
+from .horarios import generar_horarios, invalidar_disponibles
+from .sucursales import reabastecer
+from .tickets import descartar_tickets
+from .models import (
+    CambioMasivo,
+    Cliente,
+    Existencia,
+    HorarioEntrega,
+    Producto,
+    Pedido,
+    PedidoItem,
+    PedidoTransicion,
+    PedidoArchivado,
+    Promocion,
+    Sucursal,
+)
+
+
+def _pedidos_editados(pedidos):
+    """Datos o renglones cambiaron: nueva copia para seguimiento y tickets por regenerar."""
+    for pedido in pedidos:
+        pedido.guardar_resumen()
+    descartar_tickets(p.id for p in pedidos)
+
+
+class EdicionMasivaForm(forms.Form):
+    operacion = forms.ChoiceField(choices=CambioMasivo.OPERACION_CHOICES)
+    valor = forms.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        initial=0,
+        help_text="Porcentaje (5 = +5%, -10 = -10%), monto, precio o unidades según la operación.",
+    )
+    sucursal = forms.ModelChoiceField(
+        queryset=Sucursal.objects.filter(activo=True),
+        required=False,
+        empty_label="— Producto.stock —",
+        help_text="Solo para operaciones de stock.",
+    )
+
+
+class SoloFiltrosChangeList(ChangeList):
+    """Arma el queryset filtrado del changelist sin los COUNT de la paginación."""
+
+    def get_results(self, request):
+        pass
 
 
 @admin.register(Producto)
@@ -11,7 +67,87 @@ class ProductoAdmin(admin.ModelAdmin):
     list_filter = ("categoria", "activo")
     search_fields = ("nombre", "descripcion")
     list_editable = ("precio", "stock", "activo")
+    # Cambios a muchos productos: "Edición masiva" (un UPDATE por cambio)
     ordering = ("-id",)
+    change_list_template = "admin/productos/producto/change_list.html"
+
+    actions = ["editar_seleccionados"]
+
+    def get_urls(self):
+        return [
+            path(
+                "edicion-masiva/",
+                self.admin_site.admin_view(self.edicion_masiva_view),
+                name="productos_producto_edicion_masiva",
+            ),
+        ] + super().get_urls()
+
+    def get_changelist(self, request, **kwargs):
+        if getattr(request, "solo_filtros", False):
+            return SoloFiltrosChangeList
+        return super().get_changelist(request, **kwargs)
+
+    @admin.action(description="Edición masiva de los seleccionados", permissions=["change"])
+    def editar_seleccionados(self, request, queryset):
+        ids = ",".join(str(pk) for pk in queryset.values_list("id", flat=True))
+        return redirect(f"{reverse('admin:productos_producto_edicion_masiva')}?id__in={ids}")
+
+    def edicion_masiva_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        # Mismos filtros que la lista (querystring del changelist)
+        request.solo_filtros = True
+        try:
+            productos = self.get_changelist_instance(request).get_queryset(request).order_by()
+        except IncorrectLookupParameters:
+            self.message_user(request, "Filtros inválidos.", messages.ERROR)
+            return redirect("admin:productos_producto_changelist")
+
+        filtro = request.GET.urlencode()
+        form = EdicionMasivaForm(request.POST or None)
+        previa = None
+
+        if request.method == "POST" and form.is_valid():
+            datos = form.cleaned_data
+            sucursal_id = datos["sucursal"].id if datos["sucursal"] else None
+
+            # El stock de una sucursal vive en Existencia: pide también ese permiso
+            if (
+                sucursal_id is not None
+                and datos["operacion"] in DE_STOCK
+                and not request.user.has_perm("productos.change_existencia")
+            ):
+                raise PermissionDenied
+
+            if "aplicar" in request.POST:
+                cambio = aplicar(
+                    productos,
+                    datos["operacion"],
+                    datos["valor"],
+                    usuario=request.user,
+                    filtro=filtro,
+                    sucursal_id=sucursal_id,
+                )
+                self.message_user(request, f"{cambio}.")
+                return redirect(f"{reverse('admin:productos_producto_changelist')}?{filtro}")
+
+            previa = vista_previa(productos, datos["operacion"], datos["valor"], sucursal_id)
+
+        return TemplateResponse(request, "admin/productos/producto/edicion_masiva.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Edición masiva de productos",
+            "form": form,
+            "filtro": filtro,
+            "actual": previa or productos.aggregate(
+                productos=Count("id"),
+                precio_min=Min("precio"),
+                precio_max=Max("precio"),
+                stock_antes=Sum("stock"),
+            ),
+            "previa": previa,
+        })
 
 
 class PedidoItemInline(admin.TabularInline):
@@ -21,23 +157,77 @@ class PedidoItemInline(admin.TabularInline):
         "nombre_producto",
         "precio_unitario",
         "cantidad",
+        "descuento",
+        "promocion",
         "subtotal",
     )
     can_delete = False
 
 
+class PedidoTransicionInline(admin.TabularInline):
+    model = PedidoTransicion
+    extra = 0
+    fields = ("desde", "hacia", "usuario", "creado_en")
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class PedidoAdminForm(forms.ModelForm):
+    class Meta:
+        model = Pedido
+        fields = "__all__"
+
+    def clean_estado(self):
+        nuevo = self.cleaned_data["estado"]
+        actual = self.instance.estado if self.instance.pk else None
+
+        if actual and nuevo != actual and not puede_transicionar(actual, nuevo):
+            raise forms.ValidationError(
+                f"No se puede pasar de {self.instance.get_estado_display()} "
+                f"a {dict(Pedido.ESTADO_CHOICES)[nuevo]}."
+            )
+        return nuevo
+
+
+def _accion_transicion(hacia, descripcion):
+    @admin.action(description=descripcion, permissions=["change"])
+    def accion(modeladmin, request, queryset):
+        ids = list(queryset.values_list("id", flat=True))
+        cambiados = aplicar_transicion(ids, hacia, usuario=request.user)
+
+        modeladmin.message_user(
+            request,
+            f"{cambiados} pedido(s) pasaron a {dict(Pedido.ESTADO_CHOICES)[hacia]}.",
+        )
+        if cambiados < len(ids):
+            modeladmin.message_user(
+                request,
+                f"{len(ids) - cambiados} pedido(s) se ignoraron: no pueden hacer esa transición.",
+                level=messages.WARNING,
+            )
+
+    accion.__name__ = f"marcar_{hacia.lower()}"
+    return accion
+
+
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
+    form = PedidoAdminForm
     list_display = (
         "id",
         "nombre",
         "boton_imprimir",
         "estado",
+        "horario",
         "telefono",
         "total",
         "creado_en",
     )
-    list_filter = ("estado", "creado_en")
+    list_filter = ("estado", "sucursal", "creado_en")
+    list_select_related = ("horario", "sucursal")
     search_fields = ("nombre", "telefono", "direccion_envio")
     ordering = ("-creado_en",)
 
@@ -45,18 +235,57 @@ class PedidoAdmin(admin.ModelAdmin):
         "token",
         "creado_en",
         "subtotal",
+        "descuento",
         "envio",
         "total",
+        "estado_version",
     )
 
-    inlines = [PedidoItemInline]
+    inlines = [PedidoItemInline, PedidoTransicionInline]
+
+    actions = [
+        _accion_transicion("EN_PREPARACION", "Pasar a En preparación"),
+        _accion_transicion("EN_CAMINO", "Pasar a En camino"),
+        _accion_transicion("ENTREGADO", "Marcar como Entregado"),
+        _accion_transicion("CANCELADO", "Cancelar (regresa stock)"),
+    ]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Un teléfono completo se busca por el índice de Cliente, no con icontains
+        telefono = normalizar_telefono(search_term)
+        solo_telefono = all(ch.isdigit() or ch in " -()." for ch in search_term.strip())
+
+        if solo_telefono and len(telefono) == 10:
+            return queryset.filter(cliente__telefono=telefono), False
+
+        return super().get_search_results(request, queryset, search_term)
+
+    def save_model(self, request, obj, form, change):
+        # El cambio de estado pasa por la máquina de estados (bitácora + stock)
+        if change and "estado" in form.changed_data:
+            nuevo = obj.estado
+            obj.estado = form.initial["estado"]
+            super().save_model(request, obj, form, change)
+            aplicar_transicion([obj.id], nuevo, usuario=request.user)
+            obj.refresh_from_db(fields=["estado", "estado_version"])
+            return
+
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Datos o renglones editados: la página de seguimiento lee la copia
+        _pedidos_editados([form.instance])
 
     def boton_imprimir(self, obj):
         url = reverse("imprimir_pedido", args=[obj.id])
 
         return format_html(
-            '<a class="button" href="{}" target="_blank">🖨 Imprimir</a>',
+            '<a class="button" href="{}" target="_blank">🖨 Imprimir</a> '
+            '<a href="{}">🧾 Ticket</a> <a href="{}">PDF</a>',
             url,
+            reverse("ticket_pedido", args=[obj.id, "escpos"]),
+            reverse("ticket_pedido", args=[obj.id, "pdf"]),
         )
 
     boton_imprimir.short_description = "Imprimir"
@@ -70,7 +299,268 @@ class PedidoItemAdmin(admin.ModelAdmin):
         "nombre_producto",
         "cantidad",
         "precio_unitario",
+        "descuento",
         "subtotal",
     )
     search_fields = ("nombre_producto",)
-    list_filter = ("pedido",)
\ No newline at end of file
+    list_filter = ("pedido",)
+
+    # Cualquier cambio a renglones regenera la copia y los tickets del pedido
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        _pedidos_editados([obj.pedido])
+
+    def delete_model(self, request, obj):
+        pedido = obj.pedido
+        super().delete_model(request, obj)
+        _pedidos_editados([pedido])
+
+    def delete_queryset(self, request, queryset):
+        pedido_ids = set(queryset.values_list("pedido_id", flat=True))
+        super().delete_queryset(request, queryset)
+        _pedidos_editados(list(Pedido.objects.filter(id__in=pedido_ids)))
+
+
+class GenerarHorariosForm(forms.Form):
+    desde = forms.DateField(initial=timezone.localdate)
+    dias = forms.IntegerField(min_value=1, max_value=90, initial=14)
+    capacidad = forms.IntegerField(min_value=1, initial=20)
+
+
+@admin.register(HorarioEntrega)
+class HorarioEntregaAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "inicio", "fin", "capacidad", "reservados", "activo")
+    list_filter = ("activo", "fecha")
+    list_editable = ("capacidad", "activo")
+    readonly_fields = ("reservados",)
+    ordering = ("fecha", "inicio")
+    date_hierarchy = "fecha"
+    change_list_template = "admin/productos/horarioentrega/change_list.html"
+
+    actions = ["abrir", "cerrar"]
+
+    def get_urls(self):
+        return [
+            path(
+                "generar/",
+                self.admin_site.admin_view(self.generar_view),
+                name="productos_horarioentrega_generar",
+            ),
+        ] + super().get_urls()
+
+    def generar_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = GenerarHorariosForm(request.POST or None)
+
+        if request.method == "POST" and form.is_valid():
+            creados = generar_horarios(
+                form.cleaned_data["desde"],
+                form.cleaned_data["dias"],
+                form.cleaned_data["capacidad"],
+            )
+            self.message_user(request, f"{creados} horarios nuevos.")
+            return redirect("admin:productos_horarioentrega_changelist")
+
+        return TemplateResponse(request, "admin/productos/horarioentrega/generar.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Generar horarios de entrega",
+            "form": form,
+        })
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # `reservados` lo mueve el checkout con UPDATE condicional: guardar
+            # el valor leído al abrir el form podría deshacer reservas
+            obj.save(update_fields=[
+                f.name for f in obj._meta.concrete_fields
+                if not f.primary_key and f.name != "reservados"
+            ])
+        else:
+            super().save_model(request, obj, form, change)
+        invalidar_disponibles()
+
+    @admin.action(description="Abrir horarios seleccionados", permissions=["change"])
+    def abrir(self, request, queryset):
+        n = queryset.update(activo=True)
+        invalidar_disponibles()
+        self.message_user(request, f"{n} horario(s) abiertos.")
+
+    @admin.action(description="Cerrar horarios seleccionados", permissions=["change"])
+    def cerrar(self, request, queryset):
+        n = queryset.update(activo=False)
+        invalidar_disponibles()
+        self.message_user(request, f"{n} horario(s) cerrados.")
+
+
+class ReabastecerForm(forms.Form):
+    modo = forms.ChoiceField(choices=[("sumar", "Sumar al stock"), ("fijar", "Fijar el stock en")])
+    cantidad = forms.IntegerField(min_value=0, initial=20)
+    categoria = forms.ChoiceField(
+        choices=[("", "Todas")] + Producto.CATEGORIA_CHOICES,
+        required=False,
+    )
+    detalle = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 8, "placeholder": "id_producto,cantidad"}),
+        help_text="Opcional: una línea por producto. Si se llena, se ignoran cantidad y categoría.",
+    )
+
+    def clean_detalle(self):
+        cantidades = {}
+        for n, linea in enumerate(self.cleaned_data["detalle"].splitlines(), start=1):
+            if not linea.strip():
+                continue
+            try:
+                producto_id, cantidad = (int(x) for x in linea.split(","))
+            except ValueError:
+                raise forms.ValidationError(f"Línea {n}: usa el formato id_producto,cantidad.")
+            if cantidad < 0:
+                raise forms.ValidationError(f"Línea {n}: la cantidad no puede ser negativa.")
+            cantidades[producto_id] = cantidad
+
+        existentes = set(Producto.objects.filter(id__in=cantidades).values_list("id", flat=True))
+        faltantes = sorted(set(cantidades) - existentes)
+        if faltantes:
+            raise forms.ValidationError(f"No existen los productos: {', '.join(map(str, faltantes))}.")
+
+        return cantidades
+
+
+@admin.register(Sucursal)
+class SucursalAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "codigos_postales", "activo", "orden", "boton_reabastecer")
+    list_editable = ("activo", "orden")
+    search_fields = ("nombre",)
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:sucursal_id>/reabastecer/",
+                self.admin_site.admin_view(self.reabastecer_view),
+                name="productos_sucursal_reabastecer",
+            ),
+        ] + super().get_urls()
+
+    def reabastecer_view(self, request, sucursal_id):
+        # Escribe Existencia: mismo permiso que editarlas en su admin
+        if not request.user.has_perm("productos.change_existencia"):
+            raise PermissionDenied
+
+        sucursal = get_object_or_404(Sucursal, id=sucursal_id)
+        form = ReabastecerForm(request.POST or None)
+
+        if request.method == "POST" and form.is_valid():
+            cantidades = form.cleaned_data["detalle"]
+            if not cantidades:
+                productos = Producto.objects.filter(activo=True)
+                if form.cleaned_data["categoria"]:
+                    productos = productos.filter(categoria=form.cleaned_data["categoria"])
+                cantidades = dict.fromkeys(
+                    productos.values_list("id", flat=True),
+                    form.cleaned_data["cantidad"],
+                )
+
+            n = reabastecer(sucursal.id, cantidades, sumar=form.cleaned_data["modo"] == "sumar")
+            self.message_user(request, f"{sucursal}: {n} producto(s) actualizados.")
+            return redirect("admin:productos_sucursal_changelist")
+
+        return TemplateResponse(request, "admin/productos/sucursal/reabastecer.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Reabastecer {sucursal}",
+            "sucursal": sucursal,
+            "form": form,
+        })
+
+    def boton_reabastecer(self, obj):
+        return format_html(
+            '<a class="button" href="{}">Reabastecer</a>',
+            reverse("admin:productos_sucursal_reabastecer", args=[obj.id]),
+        )
+
+    boton_reabastecer.short_description = "Stock"
+
+
+@admin.register(Existencia)
+class ExistenciaAdmin(admin.ModelAdmin):
+    list_display = ("producto", "sucursal", "stock", "actualizado_en")
+    list_filter = ("sucursal", "producto__categoria")
+    list_editable = ("stock",)
+    list_select_related = ("producto", "sucursal")
+    search_fields = ("producto__nombre",)
+    autocomplete_fields = ("producto",)
+    ordering = ("sucursal", "producto__nombre")
+
+
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    list_display = (
+        "telefono",
+        "nombre",
+        "num_pedidos",
+        "total_gastado",
+        "ultimo_pedido",
+        "ver_pedidos",
+    )
+    search_fields = ("=telefono",)
+    ordering = ("-actualizado_en",)
+    readonly_fields = (
+        "num_pedidos",
+        "total_gastado",
+        "ultimo_pedido",
+        "creado_en",
+        "actualizado_en",
+    )
+
+    def ver_pedidos(self, obj):
+        url = reverse("admin:productos_pedido_changelist")
+
+        return format_html(
+            '<a href="{}?cliente__id__exact={}">Ver pedidos</a>',
+            url,
+            obj.id,
+        )
+
+    ver_pedidos.short_description = "Pedidos"
+
+
+@admin.register(PedidoArchivado)
+class PedidoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ("id", "estado", "telefono", "total", "creado_en", "archivado_en")
+    list_filter = ("estado",)
+    search_fields = ("=id", "=telefono", "=token")
+    ordering = ("-creado_en",)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Promocion)
+class PromocionAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "tipo", "producto", "categoria", "activo", "inicio", "fin")
+    list_filter = ("tipo", "activo", "categoria")
+    list_select_related = ("producto",)
+    search_fields = ("nombre",)
+    autocomplete_fields = ("producto",)
+    ordering = ("-id",)
+
+
+@admin.register(CambioMasivo)
+class CambioMasivoAdmin(admin.ModelAdmin):
+    list_display = ("creado_en", "operacion", "valor", "sucursal", "productos", "usuario", "filtro")
+    list_filter = ("operacion",)
+    list_select_related = ("sucursal", "usuario")
+    date_hierarchy = "creado_en"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ProductosConfig(AppConfig):
     name = 'productos'
+
+    def ready(self):
+        # Registra las señales que invalidan la cache del catálogo, promociones y sucursales
+        from . import catalogo, promociones, sucursales  # noqa: F401
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Pedido, PedidoItem, PedidoArchivado, PedidoTransicion
+
+
+ESTADOS_ARCHIVABLES = ("ENTREGADO", "CANCELADO")
+
+
+# =========================
+# Archivado por lotes
+# =========================
+def pedidos_archivables(dias: int):
+    limite = timezone.now() - timedelta(days=dias)
+    return Pedido.objects.filter(
+        estado__in=ESTADOS_ARCHIVABLES,
+        creado_en__lt=limite,
+    )
+
+
+def archivar_lote(ids, particionar=False) -> int:
+    """
+    Mueve un lote de pedidos al archivo en una sola transacción:
+    inserta las filas de PedidoArchivado y borra Pedido (+ items y
+    bitácora en cascada; la bitácora queda copiada en `datos`).
+    """
+    with transaction.atomic():
+        pedidos = list(
+            Pedido.objects.select_for_update(of=("self",))
+            .select_related("horario", "sucursal")
+            .filter(id__in=ids, estado__in=ESTADOS_ARCHIVABLES)
+            .order_by("id")
+        )
+        if not pedidos:
+            return 0
+
+        # Items de todo el lote en una sola consulta
+        items_por_pedido = {}
+        for it in PedidoItem.objects.filter(
+            pedido_id__in=[p.id for p in pedidos]
+        ).order_by("id"):
+            items_por_pedido.setdefault(it.pedido_id, []).append(it)
+
+        # Bitácora de estados del lote, también en una consulta
+        transiciones = {}
+        for pedido_id, desde, hacia, usuario, creado_en in (
+            PedidoTransicion.objects.filter(pedido_id__in=[p.id for p in pedidos])
+            .order_by("id")
+            .values_list("pedido_id", "desde", "hacia", "usuario__username", "creado_en")
+        ):
+            transiciones.setdefault(pedido_id, []).append({
+                "desde": desde,
+                "hacia": hacia,
+                "usuario": usuario or "",
+                "creado_en": creado_en.isoformat(),
+            })
+
+        if particionar:
+            for mes in {_inicio_de_mes(p.creado_en) for p in pedidos}:
+                asegurar_particion(mes)
+
+        PedidoArchivado.objects.bulk_create([
+            PedidoArchivado(
+                id=p.id,
+                token=p.token,
+                estado=p.estado,
+                telefono=p.telefono,
+                total=p.total,
+                creado_en=p.creado_en,
+                datos={
+                    **p.resumen(items_por_pedido.get(p.id, [])),
+                    "transiciones": transiciones.get(p.id, []),
+                },
+            )
+            for p in pedidos
+        ])
+
+        Pedido.objects.filter(id__in=[p.id for p in pedidos]).delete()
+
+    return len(pedidos)
+
+
+def buscar_archivado(pedido_id, token):
+    if not token:
+        return None
+    return (
+        PedidoArchivado.objects
+        .filter(id=pedido_id, token=token)
+        .values_list("datos", flat=True)
+        .first()
+    )
+
+
+# =========================
+# Particionado (solo Postgres)
+# =========================
+def _inicio_de_mes(fecha: datetime) -> datetime:
+    fecha = fecha.astimezone(dt_timezone.utc)
+    return datetime(fecha.year, fecha.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _mes_siguiente(mes: datetime) -> datetime:
+    if mes.month == 12:
+        return mes.replace(year=mes.year + 1, month=1)
+    return mes.replace(month=mes.month + 1)
+
+
+def soporta_particiones() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def tabla_particionada() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1
+            FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s
+            """,
+            [PedidoArchivado._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def asegurar_particion(mes: datetime):
+    tabla = PedidoArchivado._meta.db_table
+    fin = _mes_siguiente(mes)
+    nombre = f"{tabla}_{mes:%Y%m}"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{nombre}" PARTITION OF "{tabla}" '
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{fin.isoformat()}')"
+        )
+
+
+def particionar_tabla():
+    """
+    Convierte la tabla del archivo en una tabla particionada por mes de
+    `creado_en`. La llave primaria pasa a ser (id, creado_en), como exige
+    Postgres para tablas particionadas.
+    """
+    tabla = PedidoArchivado._meta.db_table
+    vieja = f"{tabla}_sin_particion"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{tabla}" RENAME TO "{vieja}"')
+        cursor.execute(
+            f'CREATE TABLE "{tabla}" (LIKE "{vieja}" INCLUDING DEFAULTS) '
+            f"PARTITION BY RANGE (creado_en)"
+        )
+        cursor.execute(f'ALTER TABLE "{tabla}" ADD PRIMARY KEY (id, creado_en)')
+        cursor.execute(f'CREATE INDEX "{tabla}_token_mes" ON "{tabla}" (token)')
+        cursor.execute(f'CREATE INDEX "{tabla}_telefono_mes" ON "{tabla}" (telefono)')
+
+        cursor.execute(f'SELECT MIN(creado_en), MAX(creado_en) FROM "{vieja}"')
+        minimo, maximo = cursor.fetchone()
+
+        if minimo is not None:
+            mes = _inicio_de_mes(minimo)
+            while mes <= maximo:
+                asegurar_particion(mes)
+                mes = _mes_siguiente(mes)
+
+        cursor.execute(f'INSERT INTO "{tabla}" SELECT * FROM "{vieja}"')
+        cursor.execute(f'DROP TABLE "{vieja}"')
@@ -0,0 +1,71 @@
+"""
+Calentamiento del worker: se llama desde config/wsgi.py y config/asgi.py
+antes de que el servidor acepte tráfico, para que la primera petición no
+pague la carga de URLs, plantillas y catálogo.
+
+uvicorn importa la app dentro de su event loop, donde el ORM no puede
+correr: ahí el calentamiento se hace en un hilo aparte y se espera.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+
+logger = logging.getLogger(__name__)
+
+PLANTILLAS = [
+    "productos/catalogo.html",
+    "productos/carrito.html",
+    "productos/checkout.html",
+    "productos/confirmacion.html",
+    "productos/estado_pedido.html",
+]
+
+
+def calentamiento_activo() -> bool:
+    return os.environ.get("CALENTAR_AL_ARRANCAR", "1").lower() in ("1", "true", "yes")
+
+
+def calentar():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _calentar()
+        return
+
+    hilo = threading.Thread(target=_calentar, name="calentar-worker")
+    hilo.start()
+    hilo.join()
+
+
+def _calentar():
+    inicio = time.perf_counter()
+
+    # URLconf completo (incluye admin) + un reverse para llenar caches
+    get_resolver().url_patterns
+    reverse("catalogo")
+
+    for nombre in PLANTILLAS:
+        get_template(nombre)
+
+    try:
+        from .catalogo import productos_catalogo
+        from .sucursales import activas
+
+        for sucursal_id in [sid for sid, _, _ in activas()] or [None]:
+            productos_catalogo(sucursal_id)
+    except Exception as e:
+        # Sin base de datos el worker igual debe arrancar
+        logger.warning("No se pudo precargar el catálogo: %s", e)
+    finally:
+        # Con `gunicorn --preload` esto corre antes del fork: no heredar conexiones
+        connections.close_all()
+
+    logger.info("Worker calentado en %.0f ms", (time.perf_counter() - inicio) * 1000)
@@ -0,0 +1,329 @@
+"""
+Generador de carga para `manage.py prueba_carga`.
+
+Simula clientes reales contra un servidor local (gunicorn/uvicorn):
+catálogo → agregar al carrito → actualizar → checkout → consultar estado.
+Solo usa la librería estándar para no agregar dependencias.
+"""
+
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+
+MEZCLA_DEFAULT = {
+    # cuántos productos distintos agrega cada visita (rango)
+    "agregar_min": 1,
+    "agregar_max": 3,
+    # probabilidad de cambiar una cantidad en el carrito
+    "prob_actualizar": 0.5,
+    # probabilidad de completar el pedido
+    "prob_checkout": 0.3,
+    # veces que se consulta el estado después de comprar
+    "consultas_estado": 3,
+}
+
+RE_PRODUCTO = re.compile(r"/carrito/agregar/(\d+)/")
+RE_PEDIDO = re.compile(r"/pedido/(\d+)/\?t=([0-9a-f]{32})")
+RE_SELECT_HORARIO = re.compile(r'name="horario".*?</select>', re.S)
+RE_OPCION = re.compile(r'<option value="(\d+)"')
+
+
+# =========================
+# Servidor local
+# =========================
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(tipo: str, puerto: int, workers: int = 1, env=None):
+    if tipo == "gunicorn":
+        cmd = [
+            sys.executable, "-m", "gunicorn", "config.wsgi:application",
+            "--bind", f"127.0.0.1:{puerto}",
+            "--workers", str(workers),
+        ]
+    elif tipo == "uvicorn":
+        cmd = [
+            sys.executable, "-m", "uvicorn", "config.asgi:application",
+            "--host", "127.0.0.1",
+            "--port", str(puerto),
+            "--workers", str(workers),
+        ]
+    else:
+        raise ValueError(f"Servidor desconocido: {tipo}")
+
+    return subprocess.Popen(
+        cmd,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def esperar_respuesta(url: str, timeout: float = 60.0, proceso=None) -> float:
+    """Espera la primera respuesta HTTP; regresa los segundos que tardó."""
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < timeout:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError("El servidor terminó antes de responder.")
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return time.perf_counter() - inicio
+        except urllib.error.HTTPError:
+            return time.perf_counter() - inicio
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Sin respuesta de {url} después de {timeout}s.")
+
+
+def detener_servidor(proceso):
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+
+
+# =========================
+# Cliente HTTP con sesión
+# =========================
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    # Cada endpoint se mide por separado: los 302 se cuentan como éxito
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Resultado:
+    __slots__ = ("endpoint", "status", "ms", "consultas", "cuerpo")
+
+    def __init__(self, endpoint, status, ms, consultas, cuerpo):
+        self.endpoint = endpoint
+        self.status = status
+        self.ms = ms
+        self.consultas = consultas
+        self.cuerpo = cuerpo
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+
+class Cliente:
+    def __init__(self, base_url: str, estadisticas):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies),
+            _SinRedirecciones,
+        )
+        self.estadisticas = estadisticas
+
+    def _csrf(self) -> str:
+        for c in self.cookies:
+            if c.name == "csrftoken":
+                return c.value
+        return ""
+
+    def pedir(self, endpoint: str, path: str, datos=None) -> Resultado:
+        url = self.base_url + path
+        headers = {"Referer": url}
+        body = None
+
+        if datos is not None:
+            csrf = self._csrf()
+            datos = {**datos, "csrfmiddlewaretoken": csrf}
+            headers["X-CSRFToken"] = csrf
+            body = urllib.parse.urlencode(datos).encode()
+
+        req = urllib.request.Request(url, data=body, headers=headers)
+        inicio = time.perf_counter()
+
+        try:
+            with self.opener.open(req, timeout=30) as resp:
+                cuerpo = resp.read()
+                status = resp.status
+                consultas = resp.headers.get("X-DB-Queries")
+        except urllib.error.HTTPError as e:
+            cuerpo = e.read()
+            status = e.code
+            consultas = e.headers.get("X-DB-Queries")
+        except OSError:
+            cuerpo = b""
+            status = 0
+            consultas = None
+
+        ms = (time.perf_counter() - inicio) * 1000
+        resultado = Resultado(
+            endpoint,
+            status,
+            ms,
+            int(consultas) if consultas is not None else None,
+            cuerpo.decode("utf-8", "replace"),
+        )
+        self.estadisticas.registrar(resultado)
+        return resultado
+
+
+# =========================
+# Estadísticas
+# =========================
+def percentil(valores_ordenados, p: float) -> float:
+    if not valores_ordenados:
+        return 0.0
+    k = max(0, min(len(valores_ordenados) - 1, int(round(p / 100 * len(valores_ordenados))) - 1))
+    return valores_ordenados[k]
+
+
+class Estadisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+        self.consultas = {}
+
+    def registrar(self, r: Resultado):
+        with self._lock:
+            self.latencias.setdefault(r.endpoint, []).append(r.ms)
+            if not r.ok:
+                self.errores[r.endpoint] = self.errores.get(r.endpoint, 0) + 1
+            if r.consultas is not None:
+                self.consultas[r.endpoint] = self.consultas.get(r.endpoint, 0) + r.consultas
+
+    def fallo(self, endpoint: str):
+        """Respuesta 2xx/3xx que no hizo lo esperado (p. ej. checkout sin pedido)."""
+        with self._lock:
+            self.errores[endpoint] = self.errores.get(endpoint, 0) + 1
+
+    def reporte(self, segundos: float) -> dict:
+        endpoints = {}
+        for endpoint, lat in sorted(self.latencias.items()):
+            lat = sorted(lat)
+            n = len(lat)
+            errores = self.errores.get(endpoint, 0)
+            consultas = self.consultas.get(endpoint)
+            endpoints[endpoint] = {
+                "peticiones": n,
+                "rps": round(n / segundos, 2) if segundos else 0.0,
+                "p50_ms": round(percentil(lat, 50), 2),
+                "p90_ms": round(percentil(lat, 90), 2),
+                "p99_ms": round(percentil(lat, 99), 2),
+                "max_ms": round(lat[-1], 2),
+                "errores": errores,
+                "tasa_error": round(errores / n, 4),
+                "consultas_total": consultas,
+                "consultas_por_peticion": round(consultas / n, 2) if consultas is not None else None,
+            }
+
+        total = sum(e["peticiones"] for e in endpoints.values())
+        return {
+            "segundos": round(segundos, 2),
+            "peticiones": total,
+            "rps": round(total / segundos, 2) if segundos else 0.0,
+            "errores": sum(e["errores"] for e in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+
+# =========================
+# Visitas simuladas
+# =========================
+def visita(cliente: Cliente, rnd: random.Random, mezcla: dict):
+    r = cliente.pedir("catalogo", "/")
+    productos = sorted(set(RE_PRODUCTO.findall(r.cuerpo)))
+    if not productos:
+        return
+
+    elegidos = rnd.sample(
+        productos,
+        min(len(productos), rnd.randint(mezcla["agregar_min"], mezcla["agregar_max"])),
+    )
+    for pid in elegidos:
+        cliente.pedir("agregar", f"/carrito/agregar/{pid}/", {})
+
+    cliente.pedir("carrito", "/carrito/")
+
+    if rnd.random() < mezcla["prob_actualizar"]:
+        pid = rnd.choice(elegidos)
+        cliente.pedir("actualizar", f"/carrito/actualizar/{pid}/", {"qty": rnd.randint(1, 3)})
+
+    if rnd.random() >= mezcla["prob_checkout"]:
+        return
+
+    r = cliente.pedir("checkout_form", "/checkout/")
+    datos = {
+        "nombre": "Prueba de carga",
+        "telefono": "".join(str(rnd.randint(0, 9)) for _ in range(10)),
+        "direccion": "123 Calle Falsa",
+        "mensaje": "",
+    }
+
+    # Con horarios de entrega configurados, elegir uno de los que ofrece el form
+    select = RE_SELECT_HORARIO.search(r.cuerpo)
+    horarios = RE_OPCION.findall(select.group(0)) if select else []
+    if horarios:
+        datos["horario"] = rnd.choice(horarios)
+
+    r = cliente.pedir("checkout", "/checkout/", datos)
+
+    # El checkout con error regresa 200 con el form: sin liga al pedido es un error
+    m = RE_PEDIDO.search(r.cuerpo)
+    if not m:
+        if r.ok:
+            cliente.estadisticas.fallo("checkout")
+        return
+
+    pedido_id, token = m.groups()
+    for _ in range(mezcla["consultas_estado"]):
+        cliente.pedir("estado", f"/pedido/{pedido_id}/?t={token}")
+
+
+def correr(base_url: str, concurrencia: int, duracion: float, mezcla=None, semilla: int = 0) -> dict:
+    mezcla = {**MEZCLA_DEFAULT, **(mezcla or {})}
+    estadisticas = Estadisticas()
+    fin = time.perf_counter() + duracion
+
+    def usuario(n):
+        rnd = random.Random(semilla * 1000 + n)
+        while time.perf_counter() < fin:
+            # sesión nueva por visita, como un cliente distinto
+            visita(Cliente(base_url, estadisticas), rnd, mezcla)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=usuario, args=(n,), daemon=True) for n in range(concurrencia)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    reporte = estadisticas.reporte(time.perf_counter() - inicio)
+    reporte["concurrencia"] = concurrencia
+    reporte["mezcla"] = mezcla
+    return reporte
+
+
+def commit_actual() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def cargar_reporte(ruta: str) -> dict:
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
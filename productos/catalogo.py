@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db.models import F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Producto
+
+
+# Cada worker tiene su propia cache: el TTL corto limita lo desactualizado
+CATALOGO_TTL = 30
+
+CLAVE_VERSION = "catalogo:version"
+
+
+def _clave_sucursal(sucursal_id) -> str:
+    return f"{CLAVE_VERSION}:s{sucursal_id}"
+
+
+def version_catalogo(sucursal_id=None) -> str:
+    """
+    Versión global (productos, precios) más la de la sucursal (su stock):
+    un checkout en una sucursal no invalida el catálogo de las demás.
+    """
+    claves = [CLAVE_VERSION]
+    if sucursal_id is not None:
+        claves.append(_clave_sucursal(sucursal_id))
+
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            versiones[clave] = cache.get_or_set(clave, 1, None)
+
+    return ".".join(str(versiones[clave]) for clave in claves)
+
+
+def invalidar_catalogo(sucursal_id=None):
+    clave = CLAVE_VERSION if sucursal_id is None else _clave_sucursal(sucursal_id)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 2, None)
+
+
+# Más vendidos primero (ver calcular_recomendaciones); sin ventas, por id
+ORDEN_CATALOGO = (F("popularidad__posicion").asc(nulls_last=True), "id")
+
+
+def _productos(sucursal_id=None):
+    """
+    Una sola consulta para todo el catálogo. `disponible` es el stock de
+    la sucursal (LEFT JOIN a Existencia) o Producto.stock si no hay sucursales.
+    """
+    qs = (
+        Producto.objects.filter(activo=True)
+        .select_related("popularidad")
+        .order_by(*ORDEN_CATALOGO)
+    )
+
+    if sucursal_id is None:
+        return qs.annotate(disponible=F("stock"))
+
+    return qs.annotate(
+        en_sucursal=FilteredRelation(
+            "existencias",
+            condition=Q(existencias__sucursal_id=sucursal_id),
+        ),
+        disponible=Coalesce(F("en_sucursal__stock"), 0),
+    )
+
+
+def productos_catalogo(sucursal_id=None) -> dict:
+    clave = f"catalogo:productos:s{sucursal_id}:v{version_catalogo(sucursal_id)}"
+
+    datos = cache.get(clave)
+    if datos is None:
+        datos = {"agua": [], "leche": []}
+        for p in _productos(sucursal_id):
+            lista = datos.get(p.categoria.lower())
+            if lista is not None:
+                lista.append(p)
+        cache.set(clave, datos, CATALOGO_TTL)
+
+    return datos
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def _producto_cambio(sender, **kwargs):
+    invalidar_catalogo()
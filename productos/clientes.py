@@ -0,0 +1,65 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cliente, Pedido, PedidoItem
+
+
+def normalizar_telefono(telefono_raw: str) -> str:
+    return "".join(ch for ch in telefono_raw if ch.isdigit())
+
+
+def obtener_cliente(telefono: str, nombre: str, direccion: str) -> Cliente:
+    """Busca por teléfono (índice único) y lo crea si es nuevo."""
+    cliente = Cliente.objects.filter(telefono=telefono).first()
+    if cliente is not None:
+        return cliente
+
+    try:
+        with transaction.atomic():
+            return Cliente.objects.create(
+                telefono=telefono,
+                nombre=nombre,
+                direccion_envio=direccion,
+            )
+    except IntegrityError:
+        # Otro checkout con el mismo teléfono lo creó primero
+        return Cliente.objects.get(telefono=telefono)
+
+
+def registrar_pedido(cliente: Cliente, pedido):
+    """Actualiza los contadores del cliente con un solo UPDATE."""
+    Cliente.objects.filter(id=cliente.id).update(
+        nombre=pedido.nombre,
+        direccion_envio=pedido.direccion_envio,
+        num_pedidos=F("num_pedidos") + 1,
+        total_gastado=F("total_gastado") + pedido.total,
+        ultimo_pedido=pedido,
+        actualizado_en=timezone.now(),
+    )
+
+
+def items_ultimo_pedido(telefono: str):
+    """
+    (producto_id, cantidad, stock) del último pedido del cliente, solo de
+    productos activos. Una sola consulta (subquery sobre Cliente). Si ese
+    pedido ya se archivó (ultimo_pedido queda en NULL), usa el más reciente
+    que le quede sin cancelar.
+    """
+    ultimo = Cliente.objects.filter(telefono=telefono).values("ultimo_pedido_id")[:1]
+    reciente = (
+        Pedido.objects.filter(cliente__telefono=telefono)
+        .exclude(estado="CANCELADO")
+        .order_by("-id")
+        .values("id")[:1]
+    )
+
+    return list(
+        PedidoItem.objects.filter(
+            pedido_id=Coalesce(Subquery(ultimo), Subquery(reciente)),
+            producto__activo=True,
+        )
+        .order_by("id")
+        .values_list("producto_id", "cantidad", "producto__stock")
+    )
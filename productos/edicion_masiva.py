@@ -0,0 +1,135 @@
+"""
+Edición masiva de productos desde el admin: cada cambio es un solo
+UPDATE con F() sobre el queryset filtrado, la vista previa es un solo
+aggregate y la versión del catálogo sube una vez. Todo queda en CambioMasivo.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, DecimalField, F, FilteredRelation, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Round
+
+from .catalogo import invalidar_catalogo
+from .models import CambioMasivo, Existencia
+
+
+CERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+OPERACIONES = {op: etiqueta for op, etiqueta in CambioMasivo.OPERACION_CHOICES}
+
+# Operaciones que pueden ir contra la Existencia de una sucursal
+DE_STOCK = {"STOCK_SUMAR", "STOCK_FIJAR"}
+
+
+def _precio(expr):
+    return Greatest(Round(expr, 2, output_field=DecimalField(max_digits=10, decimal_places=2)), CERO)
+
+
+def cambios(operacion: str, valor: Decimal, stock: str = "stock") -> dict:
+    """
+    Argumentos para `.update()`; siempre expresiones, nunca valores por
+    fila. `stock` es el campo de donde se parte (la vista previa por
+    sucursal usa una anotación).
+    """
+    if operacion == "PRECIO_PORCENTAJE":
+        return {"precio": _precio(F("precio") * (1 + valor / 100))}
+    if operacion == "PRECIO_MONTO":
+        return {"precio": _precio(F("precio") + valor)}
+    if operacion == "PRECIO_FIJAR":
+        return {"precio": max(valor, Decimal("0.00"))}
+    if operacion == "STOCK_SUMAR":
+        return {"stock": Greatest(F(stock) + int(valor), Value(0))}
+    if operacion == "STOCK_FIJAR":
+        return {"stock": max(int(valor), 0)}
+    if operacion == "ACTIVAR":
+        return {"activo": True}
+    if operacion == "DESACTIVAR":
+        return {"activo": False}
+    raise ValueError(f"Operación desconocida: {operacion}")
+
+
+def _por_sucursal(operacion, sucursal_id) -> bool:
+    return sucursal_id is not None and operacion in DE_STOCK
+
+
+def _crear_existencias(productos, sucursal_id):
+    """Filas en cero para los productos que la sucursal aún no tiene."""
+    Existencia.objects.bulk_create(
+        [
+            Existencia(sucursal_id=sucursal_id, producto_id=pid)
+            for pid in productos.values_list("id", flat=True)
+        ],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+def _nuevo(expr):
+    return expr if hasattr(expr, "resolve_expression") else Value(expr)
+
+
+def vista_previa(productos, operacion: str, valor: Decimal, sucursal_id=None) -> dict:
+    """Un solo aggregate: cuántos cambian y precio/stock antes y después."""
+    if _por_sucursal(operacion, sucursal_id):
+        # Sin fila en la sucursal cuenta como stock 0 (aplicar() la crea)
+        return productos.annotate(
+            en_sucursal=FilteredRelation(
+                "existencias",
+                condition=Q(existencias__sucursal_id=sucursal_id),
+            ),
+            actual=Coalesce(F("en_sucursal__stock"), 0),
+        ).aggregate(
+            productos=Count("id"),
+            stock_antes=Sum("actual"),
+            stock_despues=Sum(_nuevo(cambios(operacion, valor, stock="actual")["stock"])),
+        )
+
+    nuevos = {campo: _nuevo(v) for campo, v in cambios(operacion, valor).items()}
+
+    campos = {
+        "productos": Count("id"),
+        "activos": Count("id", filter=Q(activo=True)),
+        "precio_min": Min("precio"),
+        "precio_max": Max("precio"),
+        "precio_prom": Avg("precio"),
+        "stock_antes": Sum("stock"),
+    }
+    if "precio" in nuevos:
+        campos["precio_min_despues"] = Min(nuevos["precio"])
+        campos["precio_max_despues"] = Max(nuevos["precio"])
+        campos["precio_prom_despues"] = Avg(nuevos["precio"])
+    if "stock" in nuevos:
+        campos["stock_despues"] = Sum(nuevos["stock"])
+
+    return productos.aggregate(**campos)
+
+
+def aplicar(productos, operacion: str, valor: Decimal, usuario=None, filtro: str = "", sucursal_id=None):
+    """Un UPDATE, una fila en la bitácora y un solo bump del catálogo."""
+    por_sucursal = _por_sucursal(operacion, sucursal_id)
+    qs = productos
+    if por_sucursal:
+        qs = Existencia.objects.filter(sucursal_id=sucursal_id, producto__in=productos)
+
+    with transaction.atomic():
+        antes = vista_previa(productos, operacion, valor, sucursal_id)
+        if por_sucursal:
+            _crear_existencias(productos, sucursal_id)
+        afectados = qs.update(**cambios(operacion, valor))
+
+        cambio = CambioMasivo.objects.create(
+            usuario=usuario,
+            operacion=operacion,
+            valor=valor,
+            sucursal_id=sucursal_id if por_sucursal else None,
+            filtro=filtro,
+            productos=afectados,
+            resumen={k: str(v) if v is not None else None for k, v in antes.items()},
+        )
+
+        transaction.on_commit(
+            lambda: invalidar_catalogo(sucursal_id if por_sucursal else None)
+        )
+
+    return cambio
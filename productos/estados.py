@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo
+from .horarios import liberar as liberar_horarios
+from .models import Cliente, Producto, Pedido, PedidoItem, PedidoTransicion
+from .sucursales import restaurar as restaurar_sucursales
+from .tickets import generar_tickets
+
+
+# =========================
+# Transiciones permitidas
+# =========================
+# ENTREGADO y CANCELADO son finales: un pedido entregado ya no devuelve stock.
+TRANSICIONES = {
+    "CONFIRMADO": ("EN_PREPARACION", "CANCELADO"),
+    "EN_PREPARACION": ("EN_CAMINO", "CANCELADO"),
+    "EN_CAMINO": ("ENTREGADO", "CANCELADO"),
+    "ENTREGADO": (),
+    "CANCELADO": (),
+}
+
+
+def puede_transicionar(desde: str, hacia: str) -> bool:
+    return hacia in TRANSICIONES.get(desde, ())
+
+
+def estados_origen(hacia: str):
+    return [desde for desde, destinos in TRANSICIONES.items() if hacia in destinos]
+
+
+# =========================
+# Cambios en bloque
+# =========================
+def aplicar_transicion(pedido_ids, hacia: str, usuario=None) -> int:
+    """
+    Pasa los pedidos indicados a `hacia`. Los que no pueden hacer esa
+    transición se ignoran. Hace un UPDATE condicional por estado de origen,
+    inserta la bitácora con bulk_create y, si es cancelación, regresa el
+    stock. Regresa cuántos pedidos cambiaron.
+    """
+    origenes = estados_origen(hacia)
+    if not origenes:
+        return 0
+
+    with transaction.atomic():
+        por_estado = defaultdict(list)
+        for pid, desde in (
+            Pedido.objects.select_for_update()
+            .filter(id__in=list(pedido_ids), estado__in=origenes)
+            .values_list("id", "estado")
+        ):
+            por_estado[desde].append(pid)
+
+        if not por_estado:
+            return 0
+
+        for desde, ids in por_estado.items():
+            Pedido.objects.filter(id__in=ids, estado=desde).update(
+                estado=hacia,
+                estado_version=F("estado_version") + 1,
+            )
+
+        ahora = timezone.now()
+        PedidoTransicion.objects.bulk_create([
+            PedidoTransicion(
+                pedido_id=pid,
+                desde=desde,
+                hacia=hacia,
+                usuario=usuario,
+                creado_en=ahora,
+            )
+            for desde, ids in por_estado.items()
+            for pid in ids
+        ])
+
+        cambiados = [pid for ids in por_estado.values() for pid in ids]
+
+        if hacia == "CANCELADO":
+            restaurar_stock(cambiados)
+            descontar_clientes(cambiados)
+            liberar_horarios(cambiados)
+
+        if hacia == "EN_PREPARACION":
+            # Los tickets se imprimen al empezar a preparar: se renderizan una vez
+            transaction.on_commit(lambda: generar_tickets(cambiados))
+
+    return len(cambiados)
+
+
+def restaurar_stock(pedido_ids):
+    """Un UPDATE con F() por producto, con la cantidad sumada de todos los pedidos."""
+    # Pedidos surtidos por una sucursal regresan a su Existencia
+    restaurar_sucursales(pedido_ids)
+
+    totales = (
+        PedidoItem.objects.filter(pedido_id__in=pedido_ids, pedido__sucursal__isnull=True)
+        .values("producto_id")
+        .annotate(cantidad_total=Sum("cantidad"))
+        .order_by()
+    )
+
+    for fila in totales:
+        Producto.objects.filter(id=fila["producto_id"]).update(
+            stock=F("stock") + fila["cantidad_total"]
+        )
+
+    invalidar_catalogo()
+
+
+def descontar_clientes(pedido_ids):
+    """Los pedidos cancelados ya no cuentan en las estadísticas del cliente."""
+    totales = (
+        Pedido.objects.filter(id__in=pedido_ids, cliente__isnull=False)
+        .values("cliente_id")
+        .annotate(pedidos=Count("id"), total=Sum("total"))
+        .order_by()
+    )
+
+    for fila in totales:
+        Cliente.objects.filter(id=fila["cliente_id"]).update(
+            num_pedidos=F("num_pedidos") - fila["pedidos"],
+            total_gastado=F("total_gastado") - fila["total"],
+        )
@@ -0,0 +1,150 @@
+"""
+Eventos del embudo (catálogo → carrito → checkout → pedido).
+
+`emitir()` solo arma un dict y lo agrega a un buffer en memoria; un hilo
+de fondo lo vacía por lotes a un archivo JSONL de solo-agregar
+(EVENTOS_ARCHIVO). Si el buffer se llena, el evento se descarta y se
+cuenta: la petición nunca espera al disco.
+
+`manage.py embudo_eventos` lee ese archivo y calcula el embudo.
+"""
+
+import atexit
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+CAPACIDAD = 10_000
+LOTE = 500
+INTERVALO = 2.0
+
+_buffer = deque()
+_despertar = threading.Event()
+_candado = threading.Lock()
+_hilo = None
+_hilo_pid = None
+
+contadores = {"emitidos": 0, "descartados": 0, "escritos": 0, "errores": 0}
+_descartados_reportados = 0
+
+
+def activo() -> bool:
+    return bool(getattr(settings, "EVENTOS_ARCHIVO", ""))
+
+
+# =========================
+# Emisión (camino de la petición)
+# =========================
+def _visitante(request) -> str:
+    # Id propio y no la llave de sesión: no se expone y existe desde la primera visita
+    visitante = request.session.get("visitante")
+    if visitante is None:
+        visitante = secrets.token_hex(8)
+        request.session["visitante"] = visitante
+    return visitante
+
+
+def emitir(tipo: str, request=None, **datos):
+    """Encola un evento. Los valores deben ser serializables (o str())."""
+    if not activo():
+        return
+
+    if len(_buffer) >= CAPACIDAD:
+        contadores["descartados"] += 1
+        return
+
+    datos["ts"] = time.time()
+    datos["tipo"] = tipo
+    if request is not None:
+        datos["visitante"] = _visitante(request)
+
+    _buffer.append(datos)
+    contadores["emitidos"] += 1
+
+    if _hilo_pid != os.getpid():
+        _arrancar()
+    elif len(_buffer) >= LOTE:
+        _despertar.set()
+
+
+# =========================
+# Vaciado (hilo de fondo)
+# =========================
+def _arrancar():
+    global _hilo, _hilo_pid
+
+    with _candado:
+        if _hilo_pid == os.getpid():
+            return
+        _hilo = threading.Thread(target=_ciclo, name="eventos", daemon=True)
+        _hilo_pid = os.getpid()
+        _hilo.start()
+
+
+def _ciclo():
+    while True:
+        _despertar.wait(INTERVALO)
+        _despertar.clear()
+        vaciar()
+
+
+def _reportar_descartados():
+    # Los descartes quedan en el mismo archivo para que el embudo los vea
+    global _descartados_reportados
+    nuevos = contadores["descartados"] - _descartados_reportados
+    if nuevos > 0:
+        _descartados_reportados += nuevos
+        _buffer.append({"ts": time.time(), "tipo": "_descartados", "n": nuevos})
+
+
+def vaciar():
+    """Escribe lo que haya en el buffer; un write() por lote."""
+    with _candado:
+        _reportar_descartados()
+        while _buffer:
+            lote = []
+            while _buffer and len(lote) < LOTE:
+                lote.append(_buffer.popleft())
+
+            lineas = "".join(
+                json.dumps(evento, ensure_ascii=False, default=str, separators=(",", ":")) + "\n"
+                for evento in lote
+            )
+
+            try:
+                # O_APPEND: varios workers pueden escribir al mismo archivo
+                with open(settings.EVENTOS_ARCHIVO, "a", encoding="utf-8") as f:
+                    f.write(lineas)
+            except OSError as e:
+                contadores["errores"] += len(lote)
+                logger.warning("No se pudieron escribir %s eventos: %s", len(lote), e)
+                return
+
+            contadores["escritos"] += len(lote)
+
+
+def _despues_de_fork():
+    # El hijo no hereda el hilo; el candado pudo quedar tomado y los
+    # eventos pendientes son del padre
+    global _candado, _hilo, _hilo_pid, _descartados_reportados
+    _candado = threading.Lock()
+    _buffer.clear()
+    contadores.update(emitidos=0, descartados=0, escritos=0, errores=0)
+    _descartados_reportados = 0
+    _hilo = None
+    _hilo_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_despues_de_fork)
+
+atexit.register(vaciar)
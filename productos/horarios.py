@@ -0,0 +1,124 @@
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import HorarioEntrega, Pedido
+
+
+# Texto que se muestra en catálogo, checkout y confirmación
+HORARIOS_REPARTO = {
+    "lv": "12:00 pm a 2:00 pm",
+    "sd": "4:00 pm a 6:00 pm",
+}
+
+# weekday() -> (inicio, fin): lunes a viernes 12-2 pm, sábado y domingo 4-6 pm
+VENTANAS = {
+    **{d: (time(12, 0), time(14, 0)) for d in range(0, 5)},
+    **{d: (time(16, 0), time(18, 0)) for d in (5, 6)},
+}
+
+DIAS = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+
+DISPONIBLES_TTL = 60
+CLAVE_VERSION = "horarios:version"
+
+
+def etiqueta(horario) -> str:
+    return f"{DIAS[horario.fecha.weekday()]} {horario}"
+
+
+# =========================
+# Generación (admin / comando)
+# =========================
+def generar_horarios(desde, dias: int, capacidad: int) -> int:
+    """Crea las ventanas de `dias` días a partir de `desde`; las que ya existen no se tocan."""
+    nuevos = []
+    for n in range(dias):
+        fecha = desde + timedelta(days=n)
+        inicio, fin = VENTANAS[fecha.weekday()]
+        nuevos.append(HorarioEntrega(fecha=fecha, inicio=inicio, fin=fin, capacidad=capacidad))
+
+    antes = HorarioEntrega.objects.filter(fecha__gte=desde, fecha__lt=desde + timedelta(days=dias)).count()
+    HorarioEntrega.objects.bulk_create(nuevos, ignore_conflicts=True)
+    invalidar_disponibles()
+
+    return len(nuevos) - antes
+
+
+# =========================
+# Disponibilidad (cacheada)
+# =========================
+def invalidar_disponibles():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+def _abiertos():
+    ahora = timezone.localtime()
+    return HorarioEntrega.objects.filter(activo=True, fecha__gte=ahora.date()).exclude(
+        fecha=ahora.date(), inicio__lte=ahora.time()
+    )
+
+
+def disponibles(dias: int = 7) -> dict:
+    """
+    {"configurado": bool, "opciones": [(id, etiqueta, libres)]} para los
+    próximos `dias` días. `configurado` es False solo si nunca se ha
+    generado ningún horario: en ese caso el checkout funciona como antes,
+    sin ventana. Si existen pero están cerrados, llenos o ya pasaron,
+    `opciones` queda vacía y el checkout no acepta pedidos.
+    """
+    version = cache.get_or_set(CLAVE_VERSION, 1, None)
+    clave = f"horarios:disponibles:{dias}:v{version}"
+
+    datos = cache.get(clave)
+    if datos is None:
+        limite = timezone.localdate() + timedelta(days=dias)
+        horarios = list(_abiertos().filter(fecha__lt=limite))
+
+        datos = {
+            "configurado": bool(horarios) or HorarioEntrega.objects.exists(),
+            "opciones": [
+                (h.id, etiqueta(h), h.libres)
+                for h in horarios
+                if h.reservados < h.capacidad
+            ],
+        }
+        cache.set(clave, datos, DISPONIBLES_TTL)
+
+    return datos
+
+
+# =========================
+# Reservas
+# =========================
+def reservar(horario_id) -> bool:
+    """Toma un lugar con un UPDATE condicional; False si ya no hay cupo."""
+    reservado = _abiertos().filter(
+        id=horario_id,
+        reservados__lt=F("capacidad"),
+    ).update(reservados=F("reservados") + 1) == 1
+
+    invalidar_disponibles()
+    return reservado
+
+
+def liberar(pedido_ids):
+    """Regresa los lugares de pedidos cancelados, un UPDATE por horario."""
+    totales = (
+        Pedido.objects.filter(id__in=pedido_ids, horario__isnull=False)
+        .values("horario_id")
+        .annotate(pedidos=Count("id"))
+        .order_by()
+    )
+
+    for fila in totales:
+        HorarioEntrega.objects.filter(id=fila["horario_id"]).update(
+            reservados=F("reservados") - fila["pedidos"]
+        )
+
+    invalidar_disponibles()
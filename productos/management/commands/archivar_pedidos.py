@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.archivo import (
+    archivar_lote,
+    particionar_tabla,
+    pedidos_archivables,
+    soporta_particiones,
+    tabla_particionada,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve pedidos ENTREGADO/CANCELADO con más de N días a la tabla de "
+        "archivo, en lotes de una transacción cada uno."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=90)
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument(
+            "--particionar",
+            action="store_true",
+            help="(Postgres) particiona el archivo por mes de creado_en.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        dias = options["dias"]
+        lote = options["lote"]
+
+        if dias < 0 or lote <= 0:
+            raise CommandError("--dias debe ser >= 0 y --lote > 0.")
+
+        qs = pedidos_archivables(dias)
+
+        if options["dry_run"]:
+            self.stdout.write(f"Pedidos a archivar: {qs.count()}")
+            return
+
+        particionar = False
+        if soporta_particiones():
+            if options["particionar"] and not tabla_particionada():
+                self.stdout.write("Convirtiendo el archivo a tabla particionada...")
+                particionar_tabla()
+            # Una vez particionada, cada lote debe crear su partición del mes
+            particionar = tabla_particionada()
+        elif options["particionar"]:
+            raise CommandError("--particionar solo está disponible en Postgres.")
+
+        total = 0
+        ultimo_id = 0
+
+        while True:
+            ids = list(
+                qs.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:lote]
+            )
+            if not ids:
+                break
+
+            total += archivar_lote(ids, particionar=particionar)
+            ultimo_id = ids[-1]
+
+            self.stdout.write(f"  ... {total} pedidos archivados")
+
+        self.stdout.write(self.style.SUCCESS(f"Listo: {total} pedidos archivados."))
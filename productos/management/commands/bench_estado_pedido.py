@@ -0,0 +1,75 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from productos.models import Pedido
+from productos.views import pedido_detalle
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de la página de seguimiento (pedido_detalle) en proceso: "
+        "peticiones por segundo, latencia y consultas por petición sobre "
+        "pedidos reales elegidos al azar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pedidos", type=int, default=500, help="Cuántos pedidos distintos consultar.")
+        parser.add_argument("--peticiones", type=int, default=5000)
+        parser.add_argument("--semilla", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options["peticiones"] <= 0:
+            raise CommandError("--peticiones debe ser > 0.")
+
+        muestra = list(
+            Pedido.objects.order_by("-id").values_list("id", "token")[: options["pedidos"]]
+        )
+        if not muestra:
+            raise CommandError("No hay pedidos. Crea algunos (p. ej. con prueba_carga) antes de medir.")
+
+        sin_copia = Pedido.objects.filter(resumen_datos__isnull=True).count()
+        if sin_copia:
+            self.stdout.write(
+                f"Aviso: {sin_copia} pedido(s) sin copia; se generan en su primera consulta."
+            )
+
+        rf = RequestFactory()
+        rng = random.Random(options["semilla"])
+
+        def consultar(pedido_id, token):
+            respuesta = pedido_detalle(rf.get(f"/pedido/{pedido_id}/", {"t": token}), pedido_id)
+            if respuesta.status_code != 200:
+                raise CommandError(f"Pedido {pedido_id}: HTTP {respuesta.status_code}")
+
+        # Calentamiento (plantillas, y copias faltantes de la muestra)
+        for pedido_id, token in muestra:
+            consultar(pedido_id, token)
+
+        pedido_id, token = muestra[0]
+        with CaptureQueriesContext(connection) as consultas:
+            consultar(pedido_id, token)
+
+        tiempos = []
+        inicio = time.perf_counter()
+        for _ in range(options["peticiones"]):
+            pedido_id, token = rng.choice(muestra)
+            t = time.perf_counter()
+            consultar(pedido_id, token)
+            tiempos.append(time.perf_counter() - t)
+        total = time.perf_counter() - inicio
+
+        tiempos.sort()
+        p99 = tiempos[max(int(len(tiempos) * 0.99) - 1, 0)]
+
+        self.stdout.write(f"\n{options['peticiones']} consultas sobre {len(muestra)} pedidos:")
+        self.stdout.write(f"  {options['peticiones'] / total:,.0f} peticiones/s (un proceso, un hilo)")
+        self.stdout.write(
+            f"  latencia: mediana {statistics.median(tiempos) * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms"
+        )
+        self.stdout.write(f"  consultas SQL por petición: {len(consultas)}")
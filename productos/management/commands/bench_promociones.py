@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.models import Producto, Promocion
+from productos.promociones import Linea, Motor
+
+
+def reglas_sinteticas(n: int, productos: int, rng) -> list:
+    """Promociones sin guardar: el benchmark no toca la base de datos."""
+    categorias = [c for c, _ in Producto.CATEGORIA_CHOICES]
+    reglas = []
+    for i in range(n):
+        tipo = rng.choice(["DOS_POR_UNO", "PORCENTAJE", "PAQUETE"])
+        promo = Promocion(
+            nombre=f"Regla {i}",
+            tipo=tipo,
+            porcentaje=Decimal(rng.randint(5, 40)),
+            cantidad_paquete=rng.randint(2, 6),
+            precio_paquete=Decimal(rng.randint(4, 15)),
+        )
+        # Una de cada diez es por categoría
+        if i % 10 == 0:
+            promo.categoria = rng.choice(categorias)
+        else:
+            promo.producto_id = rng.randint(1, productos)
+        reglas.append(promo)
+    return reglas
+
+
+def carrito_sintetico(n: int, productos: int, rng) -> list:
+    categorias = [c for c, _ in Producto.CATEGORIA_CHOICES]
+    return [
+        Linea(
+            producto_id=rng.randint(1, productos),
+            categoria=rng.choice(categorias),
+            precio=Decimal(rng.randint(150, 600)) / 100,
+            cantidad=rng.randint(1, 12),
+        )
+        for _ in range(n)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark del motor de promociones: compila N reglas sintéticas y "
+        "evalúa carritos de distintos tamaños (sin base de datos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lineas", type=int, nargs="+", default=[1, 10, 100, 500])
+        parser.add_argument("--reglas", type=int, nargs="+", default=[10, 100, 500])
+        parser.add_argument("--productos", type=int, default=200)
+        parser.add_argument("--repeticiones", type=int, default=200)
+        parser.add_argument("--semilla", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options["productos"] <= 0 or options["repeticiones"] <= 0:
+            raise CommandError("--productos y --repeticiones deben ser > 0.")
+
+        rng = random.Random(options["semilla"])
+        productos = options["productos"]
+
+        self.stdout.write(f"{'reglas':>7} {'compilar':>10} {'líneas':>7} {'mediana':>10} {'p95':>10} {'µs/línea':>9}")
+
+        for n_reglas in options["reglas"]:
+            reglas = reglas_sinteticas(n_reglas, productos, rng)
+
+            t = time.perf_counter()
+            motor = Motor(reglas)
+            compilar_ms = (time.perf_counter() - t) * 1000
+
+            for n_lineas in options["lineas"]:
+                carrito = carrito_sintetico(n_lineas, productos, rng)
+
+                tiempos = []
+                for _ in range(options["repeticiones"]):
+                    t = time.perf_counter()
+                    motor.aplicar(carrito)
+                    tiempos.append(time.perf_counter() - t)
+
+                tiempos.sort()
+                mediana = statistics.median(tiempos)
+                p95 = tiempos[int(len(tiempos) * 0.95) - 1] if len(tiempos) > 1 else tiempos[0]
+
+                self.stdout.write(
+                    f"{n_reglas:>7} {compilar_ms:>8.2f}ms {n_lineas:>7} "
+                    f"{mediana * 1000:>8.3f}ms {p95 * 1000:>8.3f}ms "
+                    f"{mediana * 1e6 / n_lineas:>9.1f}"
+                )
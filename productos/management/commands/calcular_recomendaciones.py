@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.recomendaciones import calcular, guardar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los más vendidos (con decaimiento en el tiempo) y las "
+        "sugerencias \"se compra junto con\" a partir de PedidoItem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vida-media", type=float, default=30, help="Días para que un pedido valga la mitad.")
+        parser.add_argument("--top", type=int, default=6, help="Sugerencias por producto.")
+        parser.add_argument("--lote", type=int, default=5000, help="Renglones por bloque de lectura.")
+
+    def handle(self, *args, **options):
+        if options["vida_media"] <= 0 or options["top"] <= 0 or options["lote"] <= 0:
+            raise CommandError("--vida-media, --top y --lote deben ser > 0.")
+
+        inicio = time.perf_counter()
+        ids, popularidad, sugerencias = calcular(
+            vida_media_dias=options["vida_media"],
+            top=options["top"],
+            lote=options["lote"],
+        )
+        populares, pares = guardar(ids, popularidad, sugerencias)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo en {time.perf_counter() - inicio:.1f}s: {populares} productos con "
+            f"ventas, {pares} sugerencias guardadas."
+        ))
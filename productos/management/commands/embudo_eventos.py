@@ -0,0 +1,121 @@
+import json
+from datetime import datetime, time as dtime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+PASOS = [
+    ("catalogo_visto", "Vieron el catálogo"),
+    ("carrito_agregado", "Agregaron al carrito"),
+    ("checkout_visto", "Llegaron al checkout"),
+    ("pedido_confirmado", "Confirmaron pedido"),
+]
+BIT = {tipo: 1 << i for i, (tipo, _) in enumerate(PASOS)}
+# "Repetir pedido" llena el carrito de un golpe: cuenta como haberlo agregado
+BIT["pedido_repetido"] = BIT["carrito_agregado"]
+
+
+def _limite(fecha: str, fin: bool) -> float:
+    try:
+        dia = datetime.strptime(fecha, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {fecha} (usa AAAA-MM-DD).")
+    hora = dtime.max if fin else dtime.min
+    return timezone.make_aware(datetime.combine(dia, hora)).timestamp()
+
+
+class Command(BaseCommand):
+    help = (
+        "Métricas del embudo a partir del archivo de eventos (JSONL). "
+        "Lee línea por línea: la memoria depende de los visitantes, no del tamaño del archivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--archivo", default="", help="Default: settings.EVENTOS_ARCHIVO.")
+        parser.add_argument("--desde", default="", help="AAAA-MM-DD (hora local).")
+        parser.add_argument("--hasta", default="", help="AAAA-MM-DD, inclusive.")
+
+    def handle(self, *args, **options):
+        ruta = options["archivo"] or settings.EVENTOS_ARCHIVO
+        if not ruta:
+            raise CommandError("No hay archivo de eventos (EVENTOS_ARCHIVO vacío).")
+
+        desde = _limite(options["desde"], fin=False) if options["desde"] else None
+        hasta = _limite(options["hasta"], fin=True) if options["hasta"] else None
+
+        por_tipo = {}
+        errores = {}
+        visitantes = {}
+        descartados = 0
+        invalidas = 0
+        ventas = Decimal("0.00")
+        ahorro = Decimal("0.00")
+
+        try:
+            archivo = open(ruta, encoding="utf-8")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with archivo:
+            for linea in archivo:
+                try:
+                    evento = json.loads(linea)
+                    ts = evento["ts"]
+                    tipo = evento["tipo"]
+                except (ValueError, KeyError, TypeError):
+                    invalidas += 1
+                    continue
+
+                if (desde and ts < desde) or (hasta and ts > hasta):
+                    continue
+
+                if tipo == "_descartados":
+                    descartados += evento.get("n", 0)
+                    continue
+
+                por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
+
+                visitante = evento.get("visitante")
+                if visitante and tipo in BIT:
+                    visitantes[visitante] = visitantes.get(visitante, 0) | BIT[tipo]
+
+                if tipo == "checkout_error":
+                    motivo = evento.get("motivo", "?")
+                    errores[motivo] = errores.get(motivo, 0) + 1
+                elif tipo == "pedido_confirmado":
+                    ventas += Decimal(evento.get("total", "0"))
+                    ahorro += Decimal(evento.get("descuento", "0"))
+
+        self._reporte(visitantes, por_tipo, errores, ventas, ahorro, descartados, invalidas)
+
+    def _reporte(self, visitantes, por_tipo, errores, ventas, ahorro, descartados, invalidas):
+        self.stdout.write(f"\nEmbudo ({len(visitantes)} visitantes):")
+
+        anterior = None
+        for tipo, etiqueta in PASOS:
+            # Un paso cuenta si el visitante también pasó por todos los anteriores
+            mascara = sum(BIT[t] for t, _ in PASOS[:PASOS.index((tipo, etiqueta)) + 1])
+            n = sum(1 for bits in visitantes.values() if bits & mascara == mascara)
+
+            conversion = f"{n * 100 / anterior:5.1f}% del paso anterior" if anterior else ""
+            self.stdout.write(f"  {etiqueta:<22} {n:>8}  {conversion}")
+            anterior = n
+
+        self.stdout.write("\nEventos por tipo:")
+        for tipo, n in sorted(por_tipo.items(), key=lambda x: -x[1]):
+            self.stdout.write(f"  {tipo:<22} {n:>8}")
+
+        if errores:
+            self.stdout.write("\nErrores en checkout:")
+            for motivo, n in sorted(errores.items(), key=lambda x: -x[1]):
+                self.stdout.write(f"  {motivo:<22} {n:>8}")
+
+        self.stdout.write(f"\nVentas confirmadas: ${ventas}  (descuentos: ${ahorro})")
+
+        if descartados or invalidas:
+            self.stdout.write(self.style.WARNING(
+                f"Eventos descartados por buffer lleno: {descartados}; líneas inválidas: {invalidas}"
+            ))
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from productos.horarios import generar_horarios
+
+
+class Command(BaseCommand):
+    help = "Genera los horarios de entrega (con cupo) de los próximos días."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=14)
+        parser.add_argument("--capacidad", type=int, default=20)
+        parser.add_argument("--desde", default="", help="YYYY-MM-DD (default: hoy).")
+
+    def handle(self, *args, **options):
+        if options["dias"] <= 0 or options["capacidad"] <= 0:
+            raise CommandError("--dias y --capacidad deben ser > 0.")
+
+        try:
+            desde = date.fromisoformat(options["desde"]) if options["desde"] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--desde debe tener el formato YYYY-MM-DD.")
+
+        creados = generar_horarios(desde, options["dias"], options["capacidad"])
+        self.stdout.write(self.style.SUCCESS(f"{creados} horarios nuevos desde {desde}."))
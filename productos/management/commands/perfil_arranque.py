@@ -0,0 +1,110 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.carga import arrancar_servidor, detener_servidor, esperar_respuesta, puerto_libre
+
+
+def tiempos_de_importacion(modulo: str, env=None):
+    """
+    Importa `modulo` en un proceso nuevo con `python -X importtime`.
+    Regresa [(nombre, propio_us, acumulado_us, nivel)].
+    """
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+    )
+    if proceso.returncode != 0:
+        raise CommandError(proceso.stderr.strip().splitlines()[-1])
+
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        partes = linea[len("import time:"):].split("|")
+        propio, acumulado, nombre = int(partes[0]), int(partes[1]), partes[2]
+        nivel = (len(nombre) - len(nombre.lstrip(" "))) // 2
+        filas.append((nombre.strip(), propio, acumulado, nivel))
+    return filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Perfil de arranque: tiempo de importación por módulo de config.wsgi "
+        "(o config.asgi) y, con --primera-respuesta, tiempo desde que arranca "
+        "el proceso hasta la primera respuesta HTTP."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modulo", default="config.wsgi", choices=["config.wsgi", "config.asgi"])
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--primera-respuesta", action="store_true")
+        parser.add_argument("--servidor", choices=["gunicorn", "uvicorn"], default="gunicorn")
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--sin-calentar", action="store_true", help="Desactiva el calentamiento del worker.")
+
+    def handle(self, *args, **options):
+        env = {"CALENTAR_AL_ARRANCAR": "0" if options["sin_calentar"] else "1"}
+
+        self._importaciones(options["modulo"], options["top"], env)
+
+        if options["primera_respuesta"]:
+            self._primera_respuesta(options["servidor"], options["repeticiones"], env)
+
+    def _importaciones(self, modulo, top, env):
+        # Solo importaciones: el calentamiento se mide aparte
+        filas = tiempos_de_importacion(modulo, {**env, "CALENTAR_AL_ARRANCAR": "0"})
+
+        total = sum(propio for _, propio, _, _ in filas)
+        self.stdout.write(f"\nImportar {modulo}: {total / 1000:.1f} ms en {len(filas)} módulos\n")
+
+        por_paquete = {}
+        for nombre, propio, _, _ in filas:
+            paquete = nombre.split(".")[0]
+            por_paquete[paquete] = por_paquete.get(paquete, 0) + propio
+
+        self.stdout.write("Por paquete (tiempo propio):")
+        for paquete, us in sorted(por_paquete.items(), key=lambda x: -x[1])[:top]:
+            self.stdout.write(f"  {us / 1000:>8.1f} ms  {paquete}")
+
+        self.stdout.write("\nMódulos más lentos (acumulado):")
+        for nombre, _, acumulado, nivel in sorted(filas, key=lambda f: -f[2])[:top]:
+            self.stdout.write(f"  {acumulado / 1000:>8.1f} ms  {'  ' * min(nivel, 6)}{nombre}")
+
+    def _primera_respuesta(self, servidor, repeticiones, env):
+        primeras = []
+        segundas = []
+
+        for _ in range(repeticiones):
+            puerto = puerto_libre()
+            url = f"http://127.0.0.1:{puerto}/"
+
+            inicio = time.perf_counter()
+            proceso = arrancar_servidor(servidor, puerto, workers=1, env=env)
+            try:
+                esperar_respuesta(url, proceso=proceso)
+                primeras.append(time.perf_counter() - inicio)
+
+                t = time.perf_counter()
+                urllib.request.urlopen(url, timeout=10).read()
+                segundas.append(time.perf_counter() - t)
+            except (RuntimeError, OSError) as e:
+                raise CommandError(str(e))
+            finally:
+                detener_servidor(proceso)
+
+        self.stdout.write(f"\nPrimera respuesta con {servidor} ({repeticiones} arranques):")
+        self.stdout.write(
+            f"  proceso → primera respuesta: mediana {statistics.median(primeras) * 1000:.0f} ms "
+            f"(min {min(primeras) * 1000:.0f}, max {max(primeras) * 1000:.0f})"
+        )
+        self.stdout.write(
+            f"  segunda petición:            mediana {statistics.median(segundas) * 1000:.0f} ms"
+        )
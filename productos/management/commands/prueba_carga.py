@@ -0,0 +1,120 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.carga import (
+    arrancar_servidor,
+    cargar_reporte,
+    commit_actual,
+    correr,
+    detener_servidor,
+    esperar_respuesta,
+    puerto_libre,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: simula clientes (catálogo, carrito, checkout y "
+        "estado del pedido) contra un servidor local. Crea pedidos reales y "
+        "descuenta stock: úsalo solo con una base de datos local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="", help="Servidor ya levantado (ej. http://127.0.0.1:8000).")
+        parser.add_argument("--servidor", choices=["gunicorn", "uvicorn"], default="gunicorn")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--concurrencia", type=int, default=10)
+        parser.add_argument("--duracion", type=float, default=30.0, help="Segundos.")
+        parser.add_argument("--mezcla", default="", help="JSON con la mezcla de tráfico a reproducir.")
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--salida", default="", help="Guarda el reporte en JSON.")
+        parser.add_argument("--comparar", default="", help="Reporte JSON previo para comparar.")
+
+    def handle(self, *args, **options):
+        mezcla = cargar_reporte(options["mezcla"]) if options["mezcla"] else None
+
+        proceso = None
+        url = options["url"]
+
+        if not url:
+            puerto = puerto_libre()
+            url = f"http://127.0.0.1:{puerto}"
+            proceso = arrancar_servidor(
+                options["servidor"],
+                puerto,
+                workers=options["workers"],
+                env={"CONTAR_CONSULTAS": "1", "DEBUG": os.environ.get("DEBUG", "1")},
+            )
+            self.stdout.write(f"Arrancando {options['servidor']} en {url} ...")
+
+        try:
+            esperar_respuesta(url + "/", proceso=proceso)
+            reporte = correr(
+                url,
+                concurrencia=options["concurrencia"],
+                duracion=options["duracion"],
+                mezcla=mezcla,
+                semilla=options["semilla"],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        finally:
+            if proceso is not None:
+                detener_servidor(proceso)
+
+        reporte["commit"] = commit_actual()
+        reporte["servidor"] = options["servidor"] if proceso else url
+
+        self._imprimir(reporte)
+
+        if options["comparar"]:
+            self._comparar(cargar_reporte(options["comparar"]), reporte)
+
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as f:
+                json.dump(reporte, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Reporte guardado en {options['salida']}")
+
+    def _imprimir(self, reporte):
+        self.stdout.write(
+            f"\n{reporte['peticiones']} peticiones en {reporte['segundos']}s "
+            f"({reporte['rps']} req/s), {reporte['errores']} errores, "
+            f"commit {reporte['commit'] or '?'}\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<14}{'n':>7}{'req/s':>9}{'p50':>9}{'p90':>9}"
+            f"{'p99':>9}{'max':>9}{'err%':>7}{'sql/req':>9}"
+        )
+        for nombre, e in reporte["endpoints"].items():
+            sql = e["consultas_por_peticion"]
+            self.stdout.write(
+                f"{nombre:<14}{e['peticiones']:>7}{e['rps']:>9}{e['p50_ms']:>9}"
+                f"{e['p90_ms']:>9}{e['p99_ms']:>9}{e['max_ms']:>9}"
+                f"{e['tasa_error'] * 100:>7.1f}{'-' if sql is None else sql:>9}"
+            )
+
+    def _comparar(self, base, actual):
+        self.stdout.write(f"\nComparado con commit {base.get('commit') or '?'}:")
+
+        if base.get("concurrencia") != actual["concurrencia"]:
+            self.stdout.write(self.style.WARNING(
+                f"  ⚠ Concurrencia distinta ({base.get('concurrencia')} vs "
+                f"{actual['concurrencia']}): los números no son comparables."
+            ))
+
+        for nombre, e in actual["endpoints"].items():
+            b = base.get("endpoints", {}).get(nombre)
+            if not b:
+                continue
+
+            partes = []
+            for campo in ("p50_ms", "p99_ms", "rps", "consultas_por_peticion"):
+                antes, ahora = b.get(campo), e.get(campo)
+                if not antes or ahora is None:
+                    continue
+                cambio = (ahora - antes) / antes * 100
+                partes.append(f"{campo} {antes} → {ahora} ({cambio:+.1f}%)")
+
+            self.stdout.write(f"  {nombre:<14}" + "  ".join(partes))
@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from productos.models import Pedido, Ticket
+from productos.tickets import datos_ticket, render_pedido, tickets_para_guardar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera (o regenera con --forzar) los tickets ESC/POS y PDF de los "
+        "pedidos, repartiendo el render en varios procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=None, help="Default: núcleos del CPU.")
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument("--estado", default="", help="Solo pedidos en este estado.")
+        parser.add_argument(
+            "--forzar",
+            action="store_true",
+            help="Vuelve a renderizar aunque ya exista el ticket de la versión actual.",
+        )
+
+    def handle(self, *args, **options):
+        lote = options["lote"]
+        if lote <= 0:
+            raise CommandError("--lote debe ser > 0.")
+
+        qs = Pedido.objects.all()
+        if options["estado"]:
+            qs = qs.filter(estado=options["estado"])
+
+        if not options["forzar"]:
+            qs = qs.exclude(Exists(Ticket.objects.filter(
+                pedido_id=OuterRef("id"),
+                estado_version=OuterRef("estado_version"),
+            )))
+
+        total = 0
+        ultimo_id = 0
+
+        with ProcessPoolExecutor(max_workers=options["procesos"]) as pool:
+            while True:
+                pedidos = list(
+                    qs.filter(id__gt=ultimo_id)
+                    .order_by("id")
+                    .select_related("horario", "sucursal")
+                    .prefetch_related("items")[:lote]
+                )
+                if not pedidos:
+                    break
+
+                # La base de datos solo se toca aquí; los procesos solo renderizan
+                datos = [
+                    datos_ticket(p, sorted(p.items.all(), key=lambda it: it.id))
+                    for p in pedidos
+                ]
+                renderizados = list(pool.map(render_pedido, datos, chunksize=50))
+
+                tickets = tickets_para_guardar(renderizados)
+                if options["forzar"]:
+                    Ticket.objects.bulk_create(
+                        tickets,
+                        update_conflicts=True,
+                        unique_fields=["pedido", "formato", "estado_version"],
+                        update_fields=["sha256", "contenido"],
+                    )
+                else:
+                    Ticket.objects.bulk_create(tickets, ignore_conflicts=True)
+
+                total += len(pedidos)
+                ultimo_id = pedidos[-1].id
+                self.stdout.write(f"  ... {total} pedidos")
+
+        self.stdout.write(self.style.SUCCESS(f"Listo: tickets de {total} pedidos."))
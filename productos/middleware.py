@@ -0,0 +1,26 @@
+from django.db import connection
+
+
+class ContadorConsultasMiddleware:
+    """
+    Agrega el header `X-DB-Queries` con el número de consultas SQL que hizo
+    la petición. Solo se activa con CONTAR_CONSULTAS=1 (ver settings); lo usa
+    `manage.py prueba_carga` para reportar consultas por endpoint.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        total = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal total
+            total += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            response = self.get_response(request)
+
+        response["X-DB-Queries"] = str(total)
+        return response
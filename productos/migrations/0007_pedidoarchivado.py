@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19 00:47
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_producto_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('token', models.CharField(db_index=True, max_length=32)),
+                ('estado', models.CharField(choices=[('CONFIRMADO', 'Confirmado'), ('EN_PREPARACION', 'En preparación'), ('EN_CAMINO', 'En camino'), ('ENTREGADO', 'Entregado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('telefono', models.CharField(db_index=True, max_length=40)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('creado_en', models.DateTimeField(db_index=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('datos', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'pedido archivado',
+                'verbose_name_plural': 'pedidos archivados',
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-19 01:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def crear_clientes(apps, schema_editor):
+    """Arma Cliente a partir de los pedidos existentes (teléfonos de 10 dígitos)."""
+    Pedido = apps.get_model("productos", "Pedido")
+    Cliente = apps.get_model("productos", "Cliente")
+
+    clientes = {}
+    for pedido in Pedido.objects.order_by("id").iterator():
+        if len(pedido.telefono) != 10 or not pedido.telefono.isdigit():
+            continue
+
+        cliente = clientes.get(pedido.telefono)
+        if cliente is None:
+            cliente = Cliente.objects.create(
+                telefono=pedido.telefono,
+                nombre=pedido.nombre,
+                direccion_envio=pedido.direccion_envio,
+            )
+            clientes[pedido.telefono] = cliente
+
+        cliente.nombre = pedido.nombre
+        cliente.direccion_envio = pedido.direccion_envio
+        cliente.ultimo_pedido_id = pedido.id
+        cliente.actualizado_en = pedido.creado_en
+        if pedido.estado != "CANCELADO":
+            cliente.num_pedidos += 1
+            cliente.total_gastado += pedido.total
+
+        Pedido.objects.filter(id=pedido.id).update(cliente=cliente)
+
+    for cliente in clientes.values():
+        cliente.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_estado_maquina'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telefono', models.CharField(max_length=10, unique=True)),
+                ('nombre', models.CharField(max_length=120)),
+                ('direccion_envio', models.CharField(max_length=255)),
+                ('num_pedidos', models.PositiveIntegerField(default=0)),
+                ('total_gastado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='productos.pedido')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='cliente',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos', to='productos.cliente'),
+        ),
+        migrations.RunPython(crear_clientes, migrations.RunPython.noop),
+    ]
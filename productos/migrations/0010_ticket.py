@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_version', models.PositiveIntegerField()),
+                ('formato', models.CharField(choices=[('ESCPOS', 'Ticket térmico (ESC/POS)'), ('PDF', 'PDF')], max_length=10)),
+                ('sha256', models.CharField(max_length=64)),
+                ('contenido', models.BinaryField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='productos.pedido')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pedido', 'formato', 'estado_version'), name='ticket_unico_por_version')],
+            },
+        ),
+    ]
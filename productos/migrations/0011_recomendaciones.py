@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 02:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_ticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoPopularidad',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularidad', serialize=False, to='productos.producto')),
+                ('puntaje', models.FloatField()),
+                ('posicion', models.PositiveIntegerField(db_index=True)),
+                ('calculado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductoSugerencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntaje', models.FloatField()),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sugerencias', to='productos.producto')),
+                ('sugerido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'posicion'), name='sugerencia_unica_por_posicion')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0011_recomendaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HorarioEntrega',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('inicio', models.TimeField()),
+                ('fin', models.TimeField()),
+                ('capacidad', models.PositiveIntegerField(default=20)),
+                ('reservados', models.PositiveIntegerField(default=0)),
+                ('activo', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'horario de entrega',
+                'verbose_name_plural': 'horarios de entrega',
+                'ordering': ('fecha', 'inicio'),
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'inicio'), name='horario_unico')],
+            },
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='horario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos', to='productos.horarioentrega'),
+        ),
+    ]
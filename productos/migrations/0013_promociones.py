@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0012_horarioentrega'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='descuento',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='pedidoitem',
+            name='descuento',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='pedidoitem',
+            name='promocion',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.CreateModel(
+            name='Promocion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=120)),
+                ('tipo', models.CharField(choices=[('DOS_POR_UNO', '2x1'), ('PORCENTAJE', 'Porcentaje de descuento'), ('PAQUETE', 'Precio por paquete')], max_length=20)),
+                ('categoria', models.CharField(blank=True, choices=[('AGUA', 'Agua'), ('LECHE', 'Leche')], max_length=10)),
+                ('porcentaje', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('cantidad_paquete', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('precio_paquete', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('inicio', models.DateTimeField(blank=True, null=True)),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promociones', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'promoción',
+                'verbose_name_plural': 'promociones',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0013_promociones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=120)),
+                ('codigos_postales', models.CharField(blank=True, help_text='Separados por coma. El checkout elige la sucursal por el CP de la dirección.', max_length=500)),
+                ('activo', models.BooleanField(default=True)),
+                ('orden', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'sucursales',
+                'ordering': ('orden', 'id'),
+            },
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='pedidos', to='productos.sucursal'),
+        ),
+        migrations.CreateModel(
+            name='Existencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='productos.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='productos.sucursal')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sucursal', 'producto'), name='existencia_unica')],
+            },
+        ),
+    ]
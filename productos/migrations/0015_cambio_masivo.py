@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:40
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0014_sucursales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioMasivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion', models.CharField(choices=[('PRECIO_PORCENTAJE', 'Precio: cambiar en %'), ('PRECIO_MONTO', 'Precio: sumar/restar monto'), ('PRECIO_FIJAR', 'Precio: fijar'), ('STOCK_SUMAR', 'Stock: sumar/restar'), ('STOCK_FIJAR', 'Stock: fijar'), ('ACTIVAR', 'Activar'), ('DESACTIVAR', 'Desactivar')], max_length=20)),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('filtro', models.CharField(blank=True, max_length=500)),
+                ('productos', models.PositiveIntegerField(default=0)),
+                ('resumen', models.JSONField(default=dict)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('sucursal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='productos.sucursal')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'cambio masivo',
+                'verbose_name_plural': 'cambios masivos',
+                'ordering': ('-creado_en',),
+            },
+        ),
+    ]
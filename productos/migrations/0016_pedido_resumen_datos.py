@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0015_cambio_masivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='resumen_datos',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
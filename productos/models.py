@@ -1,4 +1,7 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from decimal import Decimal
 import secrets
 
@@ -25,6 +28,238 @@ class Producto(models.Model):
         return self.nombre
 
 
+class Promocion(models.Model):
+    """
+    Regla de descuento sobre un producto o una categoría. El motor en
+    productos.promociones las compila una vez por versión.
+    """
+
+    TIPO_CHOICES = [
+        ("DOS_POR_UNO", "2x1"),
+        ("PORCENTAJE", "Porcentaje de descuento"),
+        ("PAQUETE", "Precio por paquete"),
+    ]
+
+    nombre = models.CharField(max_length=120)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+
+    # Aplica a un producto o a toda una categoría
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="promociones",
+    )
+    categoria = models.CharField(max_length=10, choices=Producto.CATEGORIA_CHOICES, blank=True)
+
+    porcentaje = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    cantidad_paquete = models.PositiveSmallIntegerField(null=True, blank=True)
+    precio_paquete = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    activo = models.BooleanField(default=True)
+    inicio = models.DateTimeField(null=True, blank=True)
+    fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "promoción"
+        verbose_name_plural = "promociones"
+
+    def clean(self):
+        if bool(self.producto_id) == bool(self.categoria):
+            raise ValidationError("Elige un producto o una categoría (solo uno).")
+        if self.tipo == "PORCENTAJE" and not (self.porcentaje and 0 < self.porcentaje <= 100):
+            raise ValidationError({"porcentaje": "Indica un porcentaje entre 0 y 100."})
+        if self.tipo == "PAQUETE" and not (
+            self.cantidad_paquete and self.cantidad_paquete > 1 and self.precio_paquete is not None
+        ):
+            raise ValidationError("Un paquete necesita cantidad (2 o más) y precio.")
+
+    def __str__(self):
+        return self.nombre
+
+
+class ProductoPopularidad(models.Model):
+    """Ranking precalculado por `manage.py calcular_recomendaciones`."""
+
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularidad",
+    )
+    puntaje = models.FloatField()
+    posicion = models.PositiveIntegerField(db_index=True)  # 1 = el más vendido
+    calculado_en = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.posicion} {self.producto_id} ({self.puntaje:.2f})"
+
+
+class ProductoSugerencia(models.Model):
+    """Top-N "se compra junto con" de cada producto, precalculado."""
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="sugerencias")
+    sugerido = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    puntaje = models.FloatField()
+    posicion = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["producto", "posicion"],
+                name="sugerencia_unica_por_posicion",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} → {self.sugerido_id} ({self.puntaje:.2f})"
+
+
+class HorarioEntrega(models.Model):
+    """
+    Ventana de reparto con cupo. `reservados` se incrementa con un UPDATE
+    condicional en el checkout (ver productos.horarios), nunca con COUNT.
+    """
+
+    fecha = models.DateField()
+    inicio = models.TimeField()
+    fin = models.TimeField()
+    capacidad = models.PositiveIntegerField(default=20)
+    reservados = models.PositiveIntegerField(default=0)
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = "horario de entrega"
+        verbose_name_plural = "horarios de entrega"
+        ordering = ("fecha", "inicio")
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "inicio"], name="horario_unico"),
+        ]
+
+    @property
+    def libres(self) -> int:
+        return max(self.capacidad - self.reservados, 0)
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m} {self.inicio:%H:%M}–{self.fin:%H:%M}"
+
+
+class Sucursal(models.Model):
+    """
+    Cocina que surte pedidos. Mientras no exista ninguna activa, el stock
+    sale de Producto.stock como siempre (ver productos.sucursales).
+    """
+
+    nombre = models.CharField(max_length=120)
+    codigos_postales = models.CharField(
+        max_length=500,
+        blank=True,
+        help_text="Separados por coma. El checkout elige la sucursal por el CP de la dirección.",
+    )
+    activo = models.BooleanField(default=True)
+    orden = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "sucursales"
+        ordering = ("orden", "id")
+
+    def codigos(self) -> set:
+        return {c.strip() for c in self.codigos_postales.split(",") if c.strip()}
+
+    def __str__(self):
+        return self.nombre
+
+
+class Existencia(models.Model):
+    """Stock de un producto en una sucursal; se descuenta con UPDATE condicional."""
+
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name="existencias")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="existencias")
+    stock = models.PositiveIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["sucursal", "producto"], name="existencia_unica"),
+        ]
+
+    def __str__(self):
+        return f"{self.sucursal} · {self.producto}: {self.stock}"
+
+
+class CambioMasivo(models.Model):
+    """Bitácora de la edición masiva de productos (ver productos.edicion_masiva)."""
+
+    OPERACION_CHOICES = [
+        ("PRECIO_PORCENTAJE", "Precio: cambiar en %"),
+        ("PRECIO_MONTO", "Precio: sumar/restar monto"),
+        ("PRECIO_FIJAR", "Precio: fijar"),
+        ("STOCK_SUMAR", "Stock: sumar/restar"),
+        ("STOCK_FIJAR", "Stock: fijar"),
+        ("ACTIVAR", "Activar"),
+        ("DESACTIVAR", "Desactivar"),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    operacion = models.CharField(max_length=20, choices=OPERACION_CHOICES)
+    valor = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    # Solo para stock por sucursal; vacío = Producto
+    sucursal = models.ForeignKey(
+        Sucursal,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    filtro = models.CharField(max_length=500, blank=True)
+    productos = models.PositiveIntegerField(default=0)
+    # Vista previa (antes/después) calculada en la misma transacción
+    resumen = models.JSONField(default=dict)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "cambio masivo"
+        verbose_name_plural = "cambios masivos"
+        ordering = ("-creado_en",)
+
+    def __str__(self):
+        return f"{self.get_operacion_display()} ({self.valor}) → {self.productos} productos"
+
+
+class Cliente(models.Model):
+    """
+    Un cliente por teléfono normalizado (10 dígitos). Los contadores se
+    actualizan en el checkout con F(), no se calculan al consultar.
+    """
+
+    telefono = models.CharField(max_length=10, unique=True)
+    nombre = models.CharField(max_length=120)
+    direccion_envio = models.CharField(max_length=255)
+
+    num_pedidos = models.PositiveIntegerField(default=0)
+    total_gastado = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    ultimo_pedido = models.ForeignKey(
+        "Pedido",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.telefono})"
+
+
 class Pedido(models.Model):
     ESTADO_CHOICES = [
         ("CONFIRMADO", "Confirmado"),
@@ -38,23 +273,93 @@ class Pedido(models.Model):
     telefono = models.CharField(max_length=40)
     direccion_envio = models.CharField(max_length=255)
     mensaje = models.TextField(blank=True)
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="pedidos",
+    )
+    horario = models.ForeignKey(
+        HorarioEntrega,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="pedidos",
+    )
+    sucursal = models.ForeignKey(
+        Sucursal,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="pedidos",
+    )
 
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    # Ya restado en subtotal; se guarda para mostrar "ahorraste"
+    descuento = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
     envio = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("6.00"))
     total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
 
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default="CONFIRMADO")
+    # Sube con cada cambio de estado (ver productos.estados)
+    estado_version = models.PositiveIntegerField(default=0)
     creado_en = models.DateTimeField(auto_now_add=True)
 
     # 🔐 Token secreto (versión final)
     token = models.CharField(max_length=32, unique=True, db_index=True, blank=True)
 
+    # resumen() guardado al confirmar: el seguimiento no vuelve a leer PedidoItem
+    resumen_datos = models.JSONField(null=True, blank=True, editable=False)
+
     def save(self, *args, **kwargs):
         # genera token automáticamente si no existe
         if not self.token:
             self.token = secrets.token_hex(16)  # 32 caracteres
         super().save(*args, **kwargs)
 
+    def guardar_resumen(self, items=None) -> dict:
+        """Vuelve a serializar resumen() en resumen_datos con un UPDATE (sin save())."""
+        # `copia` cambia en cada regeneración: invalida la página ya renderizada
+        self.resumen_datos = {**self.resumen(items), "copia": secrets.token_hex(4)}
+        Pedido.objects.filter(id=self.id).update(resumen_datos=self.resumen_datos)
+        return self.resumen_datos
+
+    def resumen(self, items=None):
+        """Copia inmutable del pedido (datos, totales y renglones) en JSON."""
+        if items is None:
+            items = self.items.order_by("id")
+
+        return {
+            "id": self.id,
+            "token": self.token,
+            "estado": self.estado,
+            "estado_version": self.estado_version,
+            "creado_en": self.creado_en.isoformat() if self.creado_en else None,
+            "nombre": self.nombre,
+            "telefono": self.telefono,
+            "direccion_envio": self.direccion_envio,
+            "mensaje": self.mensaje,
+            "horario": str(self.horario) if self.horario_id else "",
+            "sucursal": self.sucursal.nombre if self.sucursal_id else "",
+            "subtotal": str(self.subtotal),
+            "descuento": str(self.descuento),
+            "envio": str(self.envio),
+            "total": str(self.total),
+            "items": [
+                {
+                    "producto_id": it.producto_id,
+                    "nombre_producto": it.nombre_producto,
+                    "precio_unitario": str(it.precio_unitario),
+                    "cantidad": it.cantidad,
+                    "descuento": str(it.descuento),
+                    "promocion": it.promocion,
+                    "subtotal": str(it.subtotal),
+                }
+                for it in items
+            ],
+        }
+
     def __str__(self):
         return f"Pedido #{self.id} - {self.nombre} - {self.total}"
 
@@ -66,6 +371,8 @@ class PedidoItem(models.Model):
     nombre_producto = models.CharField(max_length=120)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
     cantidad = models.PositiveIntegerField(default=1)
+    descuento = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    promocion = models.CharField(max_length=200, blank=True)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
 
     def save(self, *args, **kwargs):
@@ -74,8 +381,89 @@ class PedidoItem(models.Model):
             self.nombre_producto = self.producto.nombre
         if (self.precio_unitario in [None, Decimal("0.00")]) and self.producto_id:
             self.precio_unitario = self.producto.precio
-        self.subtotal = (self.precio_unitario or Decimal("0.00")) * self.cantidad
+        self.subtotal = (self.precio_unitario or Decimal("0.00")) * self.cantidad - self.descuento
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.cantidad} x {self.nombre_producto} (Pedido #{self.pedido_id})"
\ No newline at end of file
+        return f"{self.cantidad} x {self.nombre_producto} (Pedido #{self.pedido_id})"
+
+
+class PedidoTransicion(models.Model):
+    """Bitácora de cambios de estado; se inserta en bloque con bulk_create."""
+
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name="transiciones")
+    desde = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES)
+    hacia = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    creado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "transición de pedido"
+        verbose_name_plural = "transiciones de pedidos"
+
+    def __str__(self):
+        return f"Pedido #{self.pedido_id}: {self.desde} → {self.hacia}"
+
+
+class Ticket(models.Model):
+    """
+    Ticket ya renderizado (ESC/POS o PDF) de un pedido. Se genera una vez
+    por versión de estado y las reimpresiones solo leen estos bytes.
+    """
+
+    FORMATO_CHOICES = [
+        ("ESCPOS", "Ticket térmico (ESC/POS)"),
+        ("PDF", "PDF"),
+    ]
+
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name="tickets")
+    estado_version = models.PositiveIntegerField()
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+
+    # sha256 del contenido; se usa como ETag
+    sha256 = models.CharField(max_length=64)
+    contenido = models.BinaryField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["pedido", "formato", "estado_version"],
+                name="ticket_unico_por_version",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Ticket {self.formato} - Pedido #{self.pedido_id} (v{self.estado_version})"
+
+
+class PedidoArchivado(models.Model):
+    """
+    Pedidos ENTREGADO/CANCELADO viejos, movidos fuera de Pedido/PedidoItem
+    por `manage.py archivar_pedidos`. Conserva el mismo id y token para que
+    el link de seguimiento siga funcionando.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    token = models.CharField(max_length=32, db_index=True)
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES)
+    telefono = models.CharField(max_length=40, db_index=True)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    creado_en = models.DateTimeField(db_index=True)
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    # Resultado de Pedido.resumen()
+    datos = models.JSONField()
+
+    class Meta:
+        verbose_name = "pedido archivado"
+        verbose_name_plural = "pedidos archivados"
+
+    def __str__(self):
+        return f"Pedido #{self.id} (archivado) - {self.estado} - {self.total}"
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+Motor de promociones (2x1, porcentaje, precio por paquete).
+
+Las reglas activas se compilan una vez por versión en dos índices
+(por producto y por categoría). Evaluar un carrito es una sola pasada
+sobre sus renglones, sin consultas: por renglón se toma el mejor
+descuento que le aplique (las promociones no se acumulan).
+
+Un 2x1 o paquete de categoría junta las piezas de todos los sabores de
+esa categoría ("2x1 en aguas" con una de mango y una de fresa = una
+gratis) y reparte el descuento entre sus renglones.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Promocion
+
+
+CLAVE_VERSION = "promociones:version"
+
+# Otros workers no reciben la invalidación del cache local: revisan la
+# versión compartida y, a lo más cada minuto, recompilan de todos modos
+MAX_VIGENCIA = timedelta(seconds=60)
+
+CENTAVO = Decimal("0.01")
+
+Regla = namedtuple("Regla", "nombre tipo porcentaje cantidad precio_paquete")
+Linea = namedtuple("Linea", "producto_id categoria precio cantidad")
+Descuento = namedtuple("Descuento", "monto explicacion")
+
+SIN_DESCUENTO = Descuento(Decimal("0.00"), "")
+
+# Tipos que, por categoría, cuentan las piezas de todos sus productos juntas
+AGRUPABLES = {"DOS_POR_UNO", "PAQUETE"}
+
+
+# =========================
+# Versión de reglas
+# =========================
+def version_promociones() -> int:
+    return cache.get_or_set(CLAVE_VERSION, 1, None)
+
+
+def invalidar_promociones():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+@receiver(post_save, sender=Promocion)
+@receiver(post_delete, sender=Promocion)
+def _promocion_cambio(sender, **kwargs):
+    invalidar_promociones()
+
+
+# =========================
+# Reglas
+# =========================
+def _regla(promo) -> Regla:
+    return Regla(
+        nombre=promo.nombre,
+        tipo=promo.tipo,
+        porcentaje=promo.porcentaje,
+        cantidad=promo.cantidad_paquete,
+        precio_paquete=promo.precio_paquete,
+    )
+
+
+def _monto(regla: Regla, precio: Decimal, cantidad: int) -> Decimal:
+    if regla.tipo == "DOS_POR_UNO":
+        return precio * (cantidad // 2)
+
+    if regla.tipo == "PORCENTAJE":
+        return (precio * cantidad * regla.porcentaje / 100).quantize(CENTAVO, ROUND_HALF_UP)
+
+    if regla.tipo == "PAQUETE":
+        paquetes = cantidad // regla.cantidad
+        ahorro = precio * regla.cantidad - regla.precio_paquete
+        return paquetes * ahorro if ahorro > 0 else Decimal("0.00")
+
+    return Decimal("0.00")
+
+
+def _explicacion(regla: Regla, cantidad: int) -> str:
+    if regla.tipo == "PORCENTAJE":
+        return f"{regla.nombre}: {regla.porcentaje.normalize():f}% de descuento"
+    if regla.tipo == "DOS_POR_UNO":
+        return _explicacion_veces(regla, cantidad // 2)
+    return _explicacion_veces(regla, cantidad // regla.cantidad)
+
+
+def _explicacion_veces(regla: Regla, veces: int) -> str:
+    """2x1: `veces` piezas gratis; paquete: `veces` paquetes armados."""
+    if regla.tipo == "DOS_POR_UNO":
+        return f"{regla.nombre}: 2x1 ({veces} gratis)"
+    return (
+        f"{regla.nombre}: {veces} paquete(s) de "
+        f"{regla.cantidad} por ${regla.precio_paquete}"
+    )
+
+
+def _en_centavos(montos: dict, total: Decimal) -> dict:
+    """Redondea {renglón: monto} a centavos sin que la suma se aleje de `total`."""
+    redondeados = {i: m.quantize(CENTAVO, ROUND_HALF_UP) for i, m in montos.items()}
+    diferencia = total - sum(redondeados.values())
+    if diferencia and redondeados:
+        mayor = max(redondeados, key=redondeados.get)
+        redondeados[mayor] += diferencia
+    return redondeados
+
+
+def _agrupado(regla: Regla, tramos):
+    """
+    Regla de categoría sobre las piezas de todos sus renglones juntas.
+    `tramos` es [(precio, cantidad, renglón)] de mayor a menor precio; se
+    recorre por tramos, nunca pieza por pieza. En el 2x1 la segunda de
+    cada par sale gratis; los paquetes se arman en ese orden. Regresa
+    ({renglón: descuento}, piezas gratis o paquetes armados).
+    """
+    por_renglon = {}
+
+    if regla.tipo == "DOS_POR_UNO":
+        posicion = 0
+        for precio, cantidad, i in tramos:
+            # Gratis: las posiciones impares (0-based) dentro del orden
+            gratis = (posicion + cantidad) // 2 - posicion // 2
+            if gratis:
+                por_renglon[i] = por_renglon.get(i, Decimal("0.00")) + precio * gratis
+            posicion += cantidad
+        return por_renglon, posicion // 2
+
+    n = regla.cantidad
+    total = Decimal("0.00")
+    paquetes = 0
+    abierto, en_abierto, suma = [], 0, Decimal("0.00")  # paquete a medio armar
+
+    for precio, cantidad, i in tramos:
+        while cantidad:
+            if not en_abierto and cantidad >= n:
+                # Paquetes completos dentro del mismo tramo: todos iguales
+                ahorro = precio * n - regla.precio_paquete
+                if ahorro <= 0:
+                    return _en_centavos(por_renglon, total), paquetes
+                completos = cantidad // n
+                por_renglon[i] = por_renglon.get(i, Decimal("0.00")) + ahorro * completos
+                total += ahorro * completos
+                paquetes += completos
+                cantidad -= completos * n
+                continue
+
+            tomar = min(cantidad, n - en_abierto)
+            abierto.append((precio, tomar, i))
+            en_abierto += tomar
+            suma += precio * tomar
+            cantidad -= tomar
+
+            if en_abierto == n:
+                ahorro = suma - regla.precio_paquete
+                if ahorro <= 0:
+                    # Los que siguen son más baratos: tampoco convienen
+                    return _en_centavos(por_renglon, total), paquetes
+                for p, c, j in abierto:
+                    por_renglon[j] = por_renglon.get(j, Decimal("0.00")) + ahorro * p * c / suma
+                total += ahorro
+                paquetes += 1
+                abierto, en_abierto, suma = [], 0, Decimal("0.00")
+
+    return _en_centavos(por_renglon, total), paquetes
+
+
+# =========================
+# Motor compilado
+# =========================
+class Motor:
+    def __init__(self, promociones, vigente_hasta=None):
+        self.por_producto = {}
+        self.por_categoria = {}
+        self.agrupadas = {}
+        self.vigente_hasta = vigente_hasta
+
+        for promo in promociones:
+            if promo.producto_id:
+                self.por_producto.setdefault(promo.producto_id, []).append(_regla(promo))
+            elif promo.categoria and promo.tipo in AGRUPABLES:
+                self._agrupable(promo)
+            elif promo.categoria:
+                self.por_categoria.setdefault(promo.categoria, []).append(_regla(promo))
+
+    def _agrupable(self, promo):
+        """
+        Solo se guarda la mejor regla agrupada de cada forma: dos 2x1 de la
+        misma categoría descuentan lo mismo, y entre paquetes del mismo
+        tamaño siempre gana el más barato.
+        """
+        reglas = self.agrupadas.setdefault(promo.categoria, [])
+        nueva = _regla(promo)
+        for k, regla in enumerate(reglas):
+            if regla.tipo != nueva.tipo:
+                continue
+            if nueva.tipo == "DOS_POR_UNO":
+                return
+            if regla.cantidad == nueva.cantidad:
+                if nueva.precio_paquete < regla.precio_paquete:
+                    reglas[k] = nueva
+                return
+        reglas.append(nueva)
+
+    def aplicar(self, lineas):
+        """
+        Una pasada: regresa (descuentos, total) con un Descuento por
+        renglón, en el mismo orden que `lineas`.
+        """
+        descuentos = []
+        tramos = {}  # categoría → [(precio, cantidad, renglón)] para las reglas agrupadas
+
+        vacio = ()
+        for i, linea in enumerate(lineas):
+            mejor, regla_mejor = Decimal("0.00"), None
+            for regla in (
+                *self.por_producto.get(linea.producto_id, vacio),
+                *self.por_categoria.get(linea.categoria, vacio),
+            ):
+                monto = _monto(regla, linea.precio, linea.cantidad)
+                if monto > mejor:
+                    mejor, regla_mejor = monto, regla
+
+            if linea.categoria in self.agrupadas and linea.cantidad > 0:
+                tramos.setdefault(linea.categoria, []).append((linea.precio, linea.cantidad, i))
+
+            if regla_mejor is None:
+                descuentos.append(SIN_DESCUENTO)
+            else:
+                descuentos.append(Descuento(mejor, _explicacion(regla_mejor, linea.cantidad)))
+
+        # Cada categoría se queda con lo que más convenga: sus reglas por
+        # renglón o una regla agrupada repartida entre sus renglones
+        for categoria, lista in tramos.items():
+            lista.sort(key=lambda tramo: -tramo[0])
+            actual = sum(descuentos[i].monto for _, _, i in lista)
+
+            ganadora = None
+            for regla in self.agrupadas[categoria]:
+                por_renglon, veces = _agrupado(regla, lista)
+                monto = sum(por_renglon.values())
+                if monto > actual:
+                    actual, ganadora = monto, (regla, por_renglon, veces)
+
+            if ganadora is not None:
+                regla, por_renglon, veces = ganadora
+                explicacion = _explicacion_veces(regla, veces)
+                for _, _, i in lista:
+                    monto = por_renglon.get(i, Decimal("0.00"))
+                    descuentos[i] = Descuento(monto, explicacion) if monto else SIN_DESCUENTO
+
+        total = sum((d.monto for d in descuentos), Decimal("0.00"))
+        return descuentos, total
+
+
+def compilar(ahora=None) -> Motor:
+    ahora = ahora or timezone.now()
+
+    vigentes = list(
+        Promocion.objects
+        .filter(activo=True)
+        .filter(Q(inicio__isnull=True) | Q(inicio__lte=ahora))
+        .filter(Q(fin__isnull=True) | Q(fin__gt=ahora))
+    )
+
+    # El motor deja de valer cuando empieza o termina alguna promoción
+    fronteras = [p.fin for p in vigentes if p.fin]
+    siguiente = (
+        Promocion.objects
+        .filter(activo=True, inicio__gt=ahora)
+        .order_by("inicio")
+        .values_list("inicio", flat=True)
+        .first()
+    )
+    if siguiente:
+        fronteras.append(siguiente)
+
+    return Motor(vigentes, vigente_hasta=min([ahora + MAX_VIGENCIA, *fronteras]))
+
+
+_motor = None
+_motor_version = None
+
+
+def motor() -> Motor:
+    """Motor del proceso; se recompila si cambió la versión o venció."""
+    global _motor, _motor_version
+
+    version = version_promociones()
+    if (
+        _motor is None
+        or _motor_version != version
+        or timezone.now() >= _motor.vigente_hasta
+    ):
+        _motor = compilar()
+        _motor_version = version
+
+    return _motor
@@ -0,0 +1,181 @@
+"""
+Más vendidos y "se compra junto con", precalculados a partir de PedidoItem.
+
+El cálculo recorre los renglones ordenados por pedido en bloques
+(`iterator`), así que la memoria depende del número de productos y de
+pares distintos, no del número de renglones.
+"""
+
+import heapq
+import math
+from array import array
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo
+from .models import Producto, PedidoItem, ProductoPopularidad, ProductoSugerencia
+
+
+def _peso(creado_en, ahora, vida_media_dias: float) -> float:
+    # Decaimiento exponencial: un pedido de hace `vida_media_dias` vale la mitad
+    edad = (ahora - creado_en).total_seconds() / 86400
+    return math.pow(0.5, max(edad, 0) / vida_media_dias)
+
+
+def calcular(vida_media_dias: float = 30, top: int = 6, lote: int = 5000, ahora=None):
+    """
+    Regresa (ids, popularidad, sugerencias):
+    - ids: ids de producto; el índice en esta lista es el índice denso
+    - popularidad: array("d") con el puntaje de cada producto
+    - sugerencias: {indice: [(puntaje, indice_sugerido), ...]} top-N
+    """
+    ahora = ahora or timezone.now()
+
+    ids = list(Producto.objects.order_by("id").values_list("id", flat=True))
+    indice = {pid: i for i, pid in enumerate(ids)}
+    n = len(ids)
+
+    popularidad = array("d", bytes(8 * n))
+    # Matriz dispersa triangular: llave a * n + b con a < b
+    pares = {}
+
+    def cerrar_pedido(productos, peso):
+        unicos = sorted(productos)
+        for x, a in enumerate(unicos):
+            for b in unicos[x + 1:]:
+                llave = a * n + b
+                pares[llave] = pares.get(llave, 0.0) + peso
+
+    filas = (
+        PedidoItem.objects
+        .exclude(pedido__estado="CANCELADO")
+        .order_by("pedido_id")
+        .values_list("pedido_id", "producto_id", "cantidad", "pedido__creado_en")
+        .iterator(chunk_size=lote)
+    )
+
+    pedido_actual = None
+    productos = set()
+    peso = 0.0
+
+    for pedido_id, producto_id, cantidad, creado_en in filas:
+        i = indice.get(producto_id)
+        if i is None:
+            continue
+
+        if pedido_id != pedido_actual:
+            if productos:
+                cerrar_pedido(productos, peso)
+            pedido_actual = pedido_id
+            productos = set()
+            peso = _peso(creado_en, ahora, vida_media_dias)
+
+        popularidad[i] += peso * cantidad
+        productos.add(i)
+
+    if productos:
+        cerrar_pedido(productos, peso)
+
+    # Top-N por producto con un heap de tamaño fijo
+    heaps = {}
+    for llave, valor in pares.items():
+        a, b = divmod(llave, n)
+        for origen, destino in ((a, b), (b, a)):
+            heap = heaps.setdefault(origen, [])
+            if len(heap) < top:
+                heapq.heappush(heap, (valor, destino))
+            elif valor > heap[0][0]:
+                heapq.heapreplace(heap, (valor, destino))
+
+    sugerencias = {
+        origen: sorted(heap, reverse=True)
+        for origen, heap in heaps.items()
+    }
+    return ids, popularidad, sugerencias
+
+
+def guardar(ids, popularidad, sugerencias):
+    """Reemplaza las tablas precalculadas en una sola transacción."""
+    ahora = timezone.now()
+
+    orden = sorted(
+        (i for i in range(len(ids)) if popularidad[i] > 0),
+        key=lambda i: -popularidad[i],
+    )
+
+    with transaction.atomic():
+        ProductoPopularidad.objects.all().delete()
+        ProductoSugerencia.objects.all().delete()
+
+        ProductoPopularidad.objects.bulk_create(
+            [
+                ProductoPopularidad(
+                    producto_id=ids[i],
+                    puntaje=popularidad[i],
+                    posicion=posicion,
+                    calculado_en=ahora,
+                )
+                for posicion, i in enumerate(orden, start=1)
+            ],
+            batch_size=1000,
+        )
+
+        ProductoSugerencia.objects.bulk_create(
+            [
+                ProductoSugerencia(
+                    producto_id=ids[origen],
+                    sugerido_id=ids[destino],
+                    puntaje=puntaje,
+                    posicion=posicion,
+                )
+                for origen, lista in sugerencias.items()
+                for posicion, (puntaje, destino) in enumerate(lista, start=1)
+            ],
+            batch_size=1000,
+        )
+
+    invalidar_catalogo()
+    return len(orden), sum(len(lista) for lista in sugerencias.values())
+
+
+# =========================
+# Lecturas (una consulta)
+# =========================
+def sugerencias_para(producto_ids, limite: int = 4, sucursal_id=None):
+    """Productos que se compran junto con los del carrito, sin repetir los del carrito."""
+    if not producto_ids:
+        return []
+
+    if sucursal_id is None:
+        con_stock = Q(sugerido__stock__gt=0)
+    else:
+        con_stock = Q(
+            sugerido__existencias__sucursal_id=sucursal_id,
+            sugerido__existencias__stock__gt=0,
+        )
+
+    filas = (
+        ProductoSugerencia.objects
+        .filter(
+            con_stock,
+            producto_id__in=producto_ids,
+            sugerido__activo=True,
+        )
+        .exclude(sugerido_id__in=producto_ids)
+        .select_related("sugerido")
+        .order_by("-puntaje")
+    )
+
+    vistos = set()
+    sugeridos = []
+    for fila in filas:
+        if fila.sugerido_id in vistos:
+            continue
+        vistos.add(fila.sugerido_id)
+        sugeridos.append(fila.sugerido)
+        if len(sugeridos) >= limite:
+            break
+
+    return sugeridos
@@ -0,0 +1,181 @@
+"""
+Stock por sucursal (Sucursal × Producto → Existencia).
+
+Mientras no haya sucursales activas todo usa Producto.stock, como antes.
+Con sucursales, el stock vive en Existencia y se descuenta con un UPDATE
+condicional por producto contra la sucursal del pedido.
+"""
+
+import re
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogo import invalidar_catalogo
+from .models import Existencia, PedidoItem, Producto, Sucursal
+
+
+SUCURSALES_TTL = 300
+CLAVE_VERSION = "sucursales:version"
+
+CODIGO_POSTAL = re.compile(r"\b\d{5}\b")
+
+
+# =========================
+# Sucursales activas (cacheadas)
+# =========================
+def invalidar_sucursales():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+@receiver(post_save, sender=Sucursal)
+@receiver(post_delete, sender=Sucursal)
+def _sucursal_cambio(sender, **kwargs):
+    invalidar_sucursales()
+
+
+@receiver(post_save, sender=Existencia)
+@receiver(post_delete, sender=Existencia)
+def _existencia_cambio(sender, instance, **kwargs):
+    invalidar_catalogo(instance.sucursal_id)
+
+
+def activas() -> list:
+    """[(id, nombre, códigos postales)] en orden; vacía = sin sucursales."""
+    version = cache.get_or_set(CLAVE_VERSION, 1, None)
+    clave = f"sucursales:activas:v{version}"
+
+    datos = cache.get(clave)
+    if datos is None:
+        datos = [
+            (s.id, s.nombre, frozenset(s.codigos()))
+            for s in Sucursal.objects.filter(activo=True)
+        ]
+        cache.set(clave, datos, SUCURSALES_TTL)
+
+    return datos
+
+
+def sucursal_actual(request):
+    """La que eligió el cliente o, si no eligió, la primera. None sin sucursales."""
+    lista = activas()
+    if not lista:
+        return None
+
+    elegida = request.session.get("sucursal")
+    for sucursal_id, _, _ in lista:
+        if sucursal_id == elegida:
+            return sucursal_id
+
+    return lista[0][0]
+
+
+def sucursal_por_direccion(direccion: str):
+    """Sucursal que cubre el código postal de la dirección (el último que aparezca)."""
+    codigos = CODIGO_POSTAL.findall(direccion or "")
+    if not codigos:
+        return None
+
+    for sucursal_id, _, cubiertos in activas():
+        if codigos[-1] in cubiertos:
+            return sucursal_id
+
+    return None
+
+
+# =========================
+# Stock
+# =========================
+def stock_disponible(producto_ids, sucursal_id) -> dict:
+    """{producto_id: stock} en una consulta."""
+    if sucursal_id is None:
+        filas = Producto.objects.filter(id__in=producto_ids).values_list("id", "stock")
+    else:
+        filas = Existencia.objects.filter(
+            sucursal_id=sucursal_id,
+            producto_id__in=producto_ids,
+        ).values_list("producto_id", "stock")
+
+    return dict(filas)
+
+
+def descontar(sucursal_id, cantidades: dict):
+    """
+    Descuenta {producto_id: cantidad} de la sucursal (o de Producto.stock
+    si sucursal_id es None). Regresa el producto_id que no alcanzó (o None).
+    Debe correr dentro de transaction.atomic: si algo falla, quien llama
+    hace rollback.
+    """
+    if sucursal_id is None:
+        filas, campo = Producto.objects.all(), "id"
+    else:
+        filas, campo = Existencia.objects.filter(sucursal_id=sucursal_id), "producto_id"
+
+    # Orden fijo: dos checkouts concurrentes bloquean filas en el mismo orden
+    for producto_id, cantidad in sorted(cantidades.items()):
+        actualizadas = filas.filter(
+            **{campo: producto_id},
+            stock__gte=cantidad,
+        ).update(stock=F("stock") - cantidad)
+
+        if actualizadas != 1:
+            return producto_id
+
+    invalidar_catalogo(sucursal_id)
+    return None
+
+
+def restaurar(pedido_ids):
+    """Regresa a cada sucursal lo de sus pedidos cancelados, un UPDATE por (sucursal, producto)."""
+    totales = (
+        PedidoItem.objects.filter(pedido_id__in=pedido_ids, pedido__sucursal__isnull=False)
+        .values("pedido__sucursal_id", "producto_id")
+        .annotate(cantidad_total=Sum("cantidad"))
+        .order_by()
+    )
+
+    sucursales = set()
+    for fila in totales:
+        Existencia.objects.filter(
+            sucursal_id=fila["pedido__sucursal_id"],
+            producto_id=fila["producto_id"],
+        ).update(stock=F("stock") + fila["cantidad_total"])
+        sucursales.add(fila["pedido__sucursal_id"])
+
+    for sucursal_id in sucursales:
+        invalidar_catalogo(sucursal_id)
+
+
+def reabastecer(sucursal_id, cantidades: dict, sumar: bool = True) -> int:
+    """
+    {producto_id: cantidad} para una sucursal: suma (o fija) el stock.
+    Crea las filas que falten y hace un UPDATE por cantidad distinta, así
+    que "a todos +20" es un solo UPDATE sin importar cuántos productos sean.
+    """
+    if not cantidades:
+        return 0
+
+    Existencia.objects.bulk_create(
+        [Existencia(sucursal_id=sucursal_id, producto_id=pid) for pid in cantidades],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+    por_cantidad = {}
+    for producto_id, cantidad in cantidades.items():
+        por_cantidad.setdefault(cantidad, []).append(producto_id)
+
+    actualizadas = 0
+    for cantidad, producto_ids in por_cantidad.items():
+        actualizadas += Existencia.objects.filter(
+            sucursal_id=sucursal_id,
+            producto_id__in=producto_ids,
+        ).update(stock=F("stock") + cantidad if sumar else cantidad)
+
+    invalidar_catalogo(sucursal_id)
+    return actualizadas
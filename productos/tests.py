@@ -1,3 +1,830 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from datetime import time, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .admin import PedidoAdminForm
+from .archivo import archivar_lote
+from .arranque import calentar
+from .catalogo import productos_catalogo
+from .clientes import items_ultimo_pedido
+from .edicion_masiva import aplicar, vista_previa
+from .estados import aplicar_transicion
+from .horarios import generar_horarios, invalidar_disponibles, liberar, reservar
+from .models import (
+    Cliente,
+    Existencia,
+    HorarioEntrega,
+    Pedido,
+    PedidoArchivado,
+    PedidoItem,
+    PedidoTransicion,
+    Producto,
+    Promocion,
+    Sucursal,
+)
+from .promociones import Linea, Motor
+from .sucursales import descontar, reabastecer
+from .tickets import datos_ticket, obtener_ticket, render_escpos
+
+
+# Sin `collectstatic` no hay manifest: las pruebas que renderizan
+# plantillas usan el storage simple aunque DEBUG esté apagado
+STATIC_SIN_MANIFEST = override_settings(STORAGES={
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+
+
+def _checkouts_en_paralelo(n, producto, datos_por_hilo):
+    """
+    Lanza `n` checkouts a la vez, cada uno con su sesión. Regresa
+    [(status, terminó en pedido)] para que un 500 no pase por "sin lugar".
+    """
+    barrera = threading.Barrier(n)
+    resultados = []
+
+    def checkout(i):
+        try:
+            cliente = Client()
+            cliente.post(f"/carrito/agregar/{producto.id}/")
+            barrera.wait()
+            r = cliente.post("/checkout/", datos_por_hilo(i))
+            resultados.append((r.status_code, b"/pedido/" in r.content))
+        finally:
+            connection.close()
+
+    hilos = [threading.Thread(target=checkout, args=(i,)) for i in range(n)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    return resultados
+
+
+# =========================
+# Arranque
+# =========================
+class CalentarTests(TransactionTestCase):
+    def test_dentro_de_un_event_loop_no_truena(self):
+        # uvicorn importa config.asgi con su event loop ya corriendo
+        cache.clear()
+        Producto.objects.create(nombre="Mango", categoria="AGUA", precio=Decimal("2.50"), stock=5)
+
+        async def importar_app():
+            calentar()
+
+        with self.assertNoLogs("productos.arranque", level="WARNING"):
+            asyncio.run(importar_app())
+
+        with self.assertNumQueries(0):
+            productos_catalogo()
+
+
+# =========================
+# Horarios de entrega
+# =========================
+@override_settings(EVENTOS_ARCHIVO="")
+class ReservarLiberarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.horario = HorarioEntrega.objects.create(
+            fecha=timezone.localdate() + timedelta(days=1),
+            inicio="12:00",
+            fin="14:00",
+            capacidad=2,
+        )
+
+    def test_reservar_hasta_la_capacidad(self):
+        self.assertTrue(reservar(self.horario.id))
+        self.assertTrue(reservar(self.horario.id))
+        self.assertFalse(reservar(self.horario.id))
+
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.reservados, 2)
+
+    def test_no_reserva_horarios_cerrados(self):
+        HorarioEntrega.objects.filter(id=self.horario.id).update(activo=False)
+        self.assertFalse(reservar(self.horario.id))
+
+    def test_liberar_regresa_un_lugar_por_pedido(self):
+        reservar(self.horario.id)
+        reservar(self.horario.id)
+        pedidos = [
+            Pedido.objects.create(nombre="A", telefono="1", direccion_envio="x", horario=self.horario)
+            for _ in range(2)
+        ]
+
+        liberar([p.id for p in pedidos])
+
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.reservados, 0)
+
+
+class HorarioEntregaAdminTests(TestCase):
+    def test_guardar_no_pisa_reservas_hechas_mientras_tanto(self):
+        cache.clear()
+        horario = HorarioEntrega.objects.create(
+            fecha=timezone.localdate() + timedelta(days=1), inicio=time(12), fin=time(14), capacidad=2,
+        )
+        # El admin leyó el horario con 0 reservados; mientras, se reservan 2
+        reservar(horario.id)
+        reservar(horario.id)
+
+        horario.capacidad = 3
+        admin.site._registry[HorarioEntrega].save_model(RequestFactory().post("/"), horario, None, True)
+
+        horario.refresh_from_db()
+        self.assertEqual((horario.capacidad, horario.reservados), (3, 2))
+
+
+@override_settings(EVENTOS_ARCHIVO="")
+@STATIC_SIN_MANIFEST
+class CheckoutSinHorariosAbiertosTests(TestCase):
+    def test_rechaza_pedido_si_todos_los_horarios_estan_cerrados(self):
+        cache.clear()
+        producto = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=10)
+        generar_horarios(timezone.localdate() + timedelta(days=1), 3, 5)
+        HorarioEntrega.objects.update(activo=False)
+        invalidar_disponibles()
+
+        cliente = Client()
+        cliente.post(f"/carrito/agregar/{producto.id}/")
+        r = cliente.post("/checkout/", {"nombre": "A", "telefono": "9165551234", "direccion": "x"})
+
+        self.assertContains(r, "no hay horarios de entrega disponibles")
+        self.assertFalse(Pedido.objects.exists())
+
+
+@override_settings(EVENTOS_ARCHIVO="")
+@STATIC_SIN_MANIFEST
+class HorarioConcurrenciaTests(TransactionTestCase):
+    def test_checkouts_en_paralelo_no_rebasan_la_capacidad(self):
+        cache.clear()
+        capacidad, intentos = 5, 20
+        producto = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=1000)
+        horario = HorarioEntrega.objects.create(
+            fecha=timezone.localdate() + timedelta(days=1),
+            inicio="12:00",
+            fin="14:00",
+            capacidad=capacidad,
+        )
+
+        resultados = _checkouts_en_paralelo(intentos, producto, lambda i: {
+            "nombre": "A",
+            "telefono": f"91655512{i:02d}",
+            "direccion": "x",
+            "horario": horario.id,
+        })
+
+        horario.refresh_from_db()
+        self.assertEqual([status for status, _ in resultados], [200] * intentos)
+        self.assertEqual(sum(ok for _, ok in resultados), capacidad)
+        self.assertEqual(Pedido.objects.filter(horario=horario).count(), capacidad)
+        self.assertEqual(horario.reservados, capacidad)
+
+
+# =========================
+# Estados del pedido
+# =========================
+@STATIC_SIN_MANIFEST
+class EstadosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=10)
+        self.cliente = Cliente.objects.create(
+            telefono="9165551234", nombre="A", num_pedidos=5, total_gastado=Decimal("100.00"),
+        )
+        self.horario = HorarioEntrega.objects.create(
+            fecha=timezone.localdate(), inicio=time(12), fin=time(14), capacidad=10, reservados=5,
+        )
+
+    def _pedido(self, estado="CONFIRMADO", cantidad=1):
+        pedido = Pedido.objects.create(
+            cliente=self.cliente, nombre="A", telefono=self.cliente.telefono,
+            direccion_envio="x", estado=estado, total=Decimal("10.00"), horario=self.horario,
+        )
+        PedidoItem.objects.create(
+            pedido=pedido, producto=self.mango, nombre_producto="Mango",
+            precio_unitario=Decimal("2.50"), cantidad=cantidad,
+        )
+        return pedido
+
+    def _actualizaciones(self, consultas, tabla):
+        return [q["sql"] for q in consultas.captured_queries if q["sql"].startswith(f'UPDATE "{tabla}"')]
+
+    def test_una_actualizacion_por_estado_de_origen(self):
+        pedidos = [
+            self._pedido("CONFIRMADO"), self._pedido("CONFIRMADO"),
+            self._pedido("EN_PREPARACION"), self._pedido("EN_CAMINO"),
+        ]
+
+        with CaptureQueriesContext(connection) as consultas:
+            cambiados = aplicar_transicion([p.id for p in pedidos], "CANCELADO")
+
+        self.assertEqual(cambiados, 4)
+        self.assertEqual(len(self._actualizaciones(consultas, "productos_pedido")), 3)
+        self.assertEqual(PedidoTransicion.objects.filter(hacia="CANCELADO").count(), 4)
+
+    def test_ignora_transiciones_no_permitidas(self):
+        entregado = self._pedido("ENTREGADO")
+        confirmado = self._pedido("CONFIRMADO")
+        version = entregado.estado_version
+
+        self.assertEqual(aplicar_transicion([entregado.id, confirmado.id], "EN_CAMINO"), 0)
+        self.assertEqual(aplicar_transicion([entregado.id], "CANCELADO"), 0)
+
+        entregado.refresh_from_db()
+        self.assertEqual((entregado.estado, entregado.estado_version), ("ENTREGADO", version))
+        self.assertFalse(PedidoTransicion.objects.exists())
+        self.mango.refresh_from_db()
+        self.assertEqual(self.mango.stock, 10)
+
+    def test_cancelar_sin_sucursal_regresa_stock_sumado(self):
+        pedidos = [self._pedido(cantidad=2), self._pedido(cantidad=3)]
+
+        with CaptureQueriesContext(connection) as consultas:
+            aplicar_transicion([p.id for p in pedidos], "CANCELADO")
+
+        self.assertEqual(len(self._actualizaciones(consultas, "productos_producto")), 1)
+        self.mango.refresh_from_db()
+        self.assertEqual(self.mango.stock, 15)
+
+    def test_cancelar_descuenta_al_cliente_y_libera_el_horario(self):
+        pedidos = [self._pedido(), self._pedido()]
+
+        aplicar_transicion([p.id for p in pedidos], "CANCELADO")
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.num_pedidos, 3)
+        self.assertEqual(self.cliente.total_gastado, Decimal("80.00"))
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.reservados, 3)
+
+    def test_formulario_del_admin_rechaza_transicion_no_permitida(self):
+        pedido = self._pedido("ENTREGADO")
+
+        form = PedidoAdminForm(data={"estado": "EN_CAMINO"}, instance=pedido)
+        form.is_valid()
+        self.assertIn("estado", form.errors)
+
+        pedido = self._pedido("CONFIRMADO")
+        form = PedidoAdminForm(data={"estado": "EN_PREPARACION"}, instance=pedido)
+        form.is_valid()
+        self.assertNotIn("estado", form.errors)
+
+    def test_accion_en_bloque_avisa_los_ignorados(self):
+        usuario = User.objects.create_superuser("admin", password="x")
+        cliente = Client()
+        cliente.force_login(usuario)
+        entregado, confirmado = self._pedido("ENTREGADO"), self._pedido("CONFIRMADO")
+
+        r = cliente.post("/admin/productos/pedido/", {
+            "action": "marcar_cancelado",
+            "_selected_action": [entregado.id, confirmado.id],
+        })
+
+        self.assertEqual(r.status_code, 302)
+        mensajes = [str(m) for m in r.wsgi_request._messages]
+        self.assertIn("1 pedido(s) pasaron a Cancelado.", mensajes)
+        self.assertTrue(any("se ignoraron" in m for m in mensajes))
+        entregado.refresh_from_db()
+        self.assertEqual(entregado.estado, "ENTREGADO")
+
+    def test_acciones_en_bloque_piden_permiso_de_cambio(self):
+        pedido = self._pedido("CONFIRMADO")
+
+        r = _staff("view_pedido").post("/admin/productos/pedido/", {
+            "action": "marcar_cancelado",
+            "_selected_action": [pedido.id],
+        })
+
+        self.assertNotEqual(r.status_code, 302)
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.estado, "CONFIRMADO")
+
+
+# =========================
+# Archivo
+# =========================
+class ArchivarTests(TestCase):
+    def test_conserva_la_bitacora_de_estados(self):
+        usuario = User.objects.create_user("cocina")
+        pedido = Pedido.objects.create(nombre="A", telefono="9165551234", direccion_envio="x")
+        for hacia in ("EN_PREPARACION", "EN_CAMINO", "ENTREGADO"):
+            aplicar_transicion([pedido.id], hacia, usuario=usuario)
+
+        self.assertEqual(archivar_lote([pedido.id]), 1)
+
+        datos = PedidoArchivado.objects.get(id=pedido.id).datos
+        self.assertEqual(
+            [(t["desde"], t["hacia"], t["usuario"]) for t in datos["transiciones"]],
+            [
+                ("CONFIRMADO", "EN_PREPARACION", "cocina"),
+                ("EN_PREPARACION", "EN_CAMINO", "cocina"),
+                ("EN_CAMINO", "ENTREGADO", "cocina"),
+            ],
+        )
+
+
+# =========================
+# Repetir pedido
+# =========================
+@STATIC_SIN_MANIFEST
+@override_settings(EVENTOS_ARCHIVO="")
+class RepetirPedidoTests(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(telefono="9165551234", nombre="A")
+        self.mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=10)
+        self.fresa = Producto.objects.create(nombre="Fresa", precio=Decimal("3.00"), stock=10)
+
+    def _pedido(self, producto, cantidad, estado="ENTREGADO"):
+        pedido = Pedido.objects.create(
+            cliente=self.cliente, nombre="A", telefono=self.cliente.telefono,
+            direccion_envio="x", estado=estado,
+        )
+        PedidoItem.objects.create(
+            pedido=pedido, producto=producto, nombre_producto=producto.nombre,
+            precio_unitario=producto.precio, cantidad=cantidad,
+        )
+        Cliente.objects.filter(id=self.cliente.id).update(ultimo_pedido=pedido)
+        return pedido
+
+    def test_usa_el_ultimo_pedido(self):
+        self._pedido(self.mango, 2)
+        self._pedido(self.fresa, 3)
+        self.assertEqual(items_ultimo_pedido(self.cliente.telefono), [(self.fresa.id, 3, 10)])
+
+    def test_si_se_archivo_usa_el_mas_reciente_sin_cancelar(self):
+        self._pedido(self.mango, 2)
+        self._pedido(self.fresa, 1, estado="CANCELADO")
+        archivado = self._pedido(self.fresa, 3)
+
+        archivar_lote([archivado.id])
+
+        self.assertEqual(items_ultimo_pedido(self.cliente.telefono), [(self.mango.id, 2, 10)])
+
+    def test_sin_pedidos_avisa_en_el_carrito(self):
+        cliente = Client()
+        session = cliente.session
+        session["cliente_telefono"] = self.cliente.telefono
+        session.save()
+
+        r = cliente.post("/carrito/repetir/", follow=True)
+
+        self.assertContains(r, "No encontramos un pedido anterior")
+
+
+# =========================
+# Promociones
+# =========================
+class PromocionesPorCategoriaTests(TestCase):
+    def _motor(self, **campos):
+        return Motor([Promocion(nombre="Promo", categoria="AGUA", **campos)])
+
+    def test_dos_por_uno_junta_sabores_distintos(self):
+        motor = self._motor(tipo="DOS_POR_UNO")
+        descuentos, total = motor.aplicar([
+            Linea(1, "AGUA", Decimal("3.00"), 1),
+            Linea(2, "AGUA", Decimal("2.50"), 1),
+            Linea(3, "LECHE", Decimal("4.00"), 1),
+        ])
+
+        # Sale gratis la más barata del par
+        self.assertEqual([d.monto for d in descuentos], [Decimal("0.00"), Decimal("2.50"), Decimal("0.00")])
+        self.assertEqual(total, Decimal("2.50"))
+
+    def test_paquete_reparte_el_ahorro_entre_renglones(self):
+        motor = self._motor(tipo="PAQUETE", cantidad_paquete=3, precio_paquete=Decimal("6.00"))
+        descuentos, total = motor.aplicar([
+            Linea(1, "AGUA", Decimal("3.00"), 2),
+            Linea(2, "AGUA", Decimal("2.00"), 1),
+            Linea(3, "AGUA", Decimal("2.00"), 1),
+        ])
+
+        # Paquete: 3 + 3 + 2 = 8 por 6; la pieza que sobra no tiene descuento
+        self.assertEqual(total, Decimal("2.00"))
+        self.assertEqual(sum(d.monto for d in descuentos), total)
+        self.assertEqual(descuentos[0].monto, Decimal("1.50"))
+        self.assertFalse(descuentos[2].monto)
+
+    def test_gana_la_regla_por_producto_si_conviene_mas(self):
+        motor = Motor([
+            Promocion(nombre="2x1 aguas", tipo="DOS_POR_UNO", categoria="AGUA"),
+            Promocion(nombre="Mango", tipo="PORCENTAJE", porcentaje=Decimal("90"), producto_id=1),
+        ])
+        descuentos, total = motor.aplicar([
+            Linea(1, "AGUA", Decimal("3.00"), 2),
+            Linea(2, "AGUA", Decimal("1.00"), 1),
+        ])
+
+        self.assertEqual(total, Decimal("5.40"))
+        self.assertIn("Mango", descuentos[0].explicacion)
+
+    def test_dos_por_uno_con_pares_entre_renglones(self):
+        motor = self._motor(tipo="DOS_POR_UNO")
+        descuentos, total = motor.aplicar([
+            Linea(1, "AGUA", Decimal("2.00"), 3),
+            Linea(2, "AGUA", Decimal("3.00"), 3),
+        ])
+
+        # 3 3 3 2 2 2: gratis la 2a, 4a y 6a; el par de en medio cruza renglones
+        self.assertEqual([d.monto for d in descuentos], [Decimal("4.00"), Decimal("3.00")])
+        self.assertEqual(total, Decimal("7.00"))
+        self.assertIn("3 gratis", descuentos[0].explicacion)
+
+    def test_paquete_explica_solo_los_paquetes_armados(self):
+        motor = self._motor(tipo="PAQUETE", cantidad_paquete=3, precio_paquete=Decimal("6.00"))
+        descuentos, total = motor.aplicar([
+            Linea(1, "AGUA", Decimal("3.00"), 3),
+            Linea(2, "AGUA", Decimal("1.00"), 3),
+        ])
+
+        # El segundo paquete (1 + 1 + 1 por 6) no conviene: solo se arma uno
+        self.assertEqual(total, Decimal("3.00"))
+        self.assertIn("1 paquete(s)", descuentos[0].explicacion)
+        self.assertFalse(descuentos[1].monto)
+
+    def test_compila_una_regla_agrupada_por_forma(self):
+        motor = Motor([
+            Promocion(nombre="2x1 A", tipo="DOS_POR_UNO", categoria="AGUA"),
+            Promocion(nombre="2x1 B", tipo="DOS_POR_UNO", categoria="AGUA"),
+            Promocion(nombre="3 por 7", tipo="PAQUETE", cantidad_paquete=3, precio_paquete=Decimal("7.00"), categoria="AGUA"),
+            Promocion(nombre="3 por 6", tipo="PAQUETE", cantidad_paquete=3, precio_paquete=Decimal("6.00"), categoria="AGUA"),
+            Promocion(nombre="4 por 8", tipo="PAQUETE", cantidad_paquete=4, precio_paquete=Decimal("8.00"), categoria="AGUA"),
+        ])
+
+        self.assertEqual([r.nombre for r in motor.agrupadas["AGUA"]], ["2x1 A", "3 por 6", "4 por 8"])
+
+
+# =========================
+# Stock por sucursal
+# =========================
+class CatalogoPorSucursalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.mango = Producto.objects.create(nombre="Mango", categoria="AGUA", precio=Decimal("2.50"), stock=50)
+        self.fresa = Producto.objects.create(nombre="Fresa", categoria="LECHE", precio=Decimal("3.00"), stock=50)
+        self.norte = Sucursal.objects.create(nombre="Norte", orden=1)
+        self.sur = Sucursal.objects.create(nombre="Sur", orden=2)
+        Existencia.objects.create(sucursal=self.norte, producto=self.mango, stock=4)
+        Existencia.objects.create(sucursal=self.sur, producto=self.fresa, stock=7)
+
+    def test_una_consulta_por_sucursal(self):
+        with self.assertNumQueries(1):
+            norte = productos_catalogo(self.norte.id)
+        with self.assertNumQueries(1):
+            sur = productos_catalogo(self.sur.id)
+
+        self.assertEqual([(p.nombre, p.disponible) for p in norte["agua"]], [("Mango", 4)])
+        self.assertEqual([(p.nombre, p.disponible) for p in norte["leche"]], [("Fresa", 0)])
+        self.assertEqual([(p.nombre, p.disponible) for p in sur["agua"]], [("Mango", 0)])
+        self.assertEqual([(p.nombre, p.disponible) for p in sur["leche"]], [("Fresa", 7)])
+
+        # Cacheado: ya no consulta
+        with self.assertNumQueries(0):
+            productos_catalogo(self.norte.id)
+
+    def test_descontar_en_una_sucursal_no_invalida_las_demas(self):
+        productos_catalogo(self.norte.id)
+        productos_catalogo(self.sur.id)
+
+        self.assertIsNone(descontar(self.norte.id, {self.mango.id: 1}))
+
+        with self.assertNumQueries(0):
+            productos_catalogo(self.sur.id)
+        with self.assertNumQueries(1):
+            norte = productos_catalogo(self.norte.id)
+        self.assertEqual(norte["agua"][0].disponible, 3)
+
+
+class SucursalesEnEscalaTests(TestCase):
+    SUCURSALES = 20
+    PRODUCTOS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f"Sabor {n}",
+                categoria="AGUA" if n % 2 else "LECHE",
+                precio=Decimal("2.50"),
+                stock=0,
+            )
+            for n in range(cls.PRODUCTOS)
+        ])
+        cls.producto_ids = list(Producto.objects.order_by("id").values_list("id", flat=True))
+        Sucursal.objects.bulk_create([Sucursal(nombre=f"Sucursal {n}") for n in range(cls.SUCURSALES)])
+        cls.sucursal_ids = list(Sucursal.objects.order_by("id").values_list("id", flat=True))
+        Existencia.objects.bulk_create([
+            Existencia(sucursal_id=s, producto_id=p, stock=(s + p) % 7)
+            for s in cls.sucursal_ids
+            for p in cls.producto_ids
+        ], batch_size=2000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_una_consulta_de_catalogo_por_sucursal(self):
+        for sucursal_id in self.sucursal_ids:
+            with self.assertNumQueries(1):
+                datos = productos_catalogo(sucursal_id)
+
+            self.assertEqual(len(datos["agua"]) + len(datos["leche"]), self.PRODUCTOS)
+            self.assertEqual(
+                sum(p.disponible for p in datos["agua"] + datos["leche"]),
+                sum((sucursal_id + p) % 7 for p in self.producto_ids),
+            )
+
+    def test_reabastecer_un_update_por_cantidad_distinta(self):
+        sucursal_id = self.sucursal_ids[0]
+        cantidades = {pid: (5, 10, 20)[n % 3] for n, pid in enumerate(self.producto_ids)}
+
+        with CaptureQueriesContext(connection) as consultas:
+            reabastecer(sucursal_id, cantidades)
+
+        actualizaciones = [
+            q for q in consultas.captured_queries
+            if q["sql"].startswith('UPDATE "productos_existencia"')
+        ]
+        self.assertEqual(len(actualizaciones), 3)
+        self.assertEqual(
+            Existencia.objects.filter(sucursal_id=sucursal_id).aggregate(total=Sum("stock"))["total"],
+            sum((sucursal_id + p) % 7 + cantidades[p] for p in self.producto_ids),
+        )
+
+
+class ReabastecerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sucursal = Sucursal.objects.create(nombre="Norte")
+        self.mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=50)
+        self.fresa = Producto.objects.create(nombre="Fresa", precio=Decimal("3.00"), stock=50)
+        Existencia.objects.create(sucursal=self.sucursal, producto=self.mango, stock=3)
+
+    def _stock(self):
+        return dict(
+            Existencia.objects.filter(sucursal=self.sucursal).values_list("producto_id", "stock")
+        )
+
+    def test_sumar_crea_las_filas_que_faltan(self):
+        reabastecer(self.sucursal.id, {self.mango.id: 5, self.fresa.id: 5})
+        self.assertEqual(self._stock(), {self.mango.id: 8, self.fresa.id: 5})
+
+    def test_fijar_reemplaza_el_stock(self):
+        reabastecer(self.sucursal.id, {self.mango.id: 2, self.fresa.id: 6}, sumar=False)
+        self.assertEqual(self._stock(), {self.mango.id: 2, self.fresa.id: 6})
+
+    def test_no_toca_producto_stock(self):
+        reabastecer(self.sucursal.id, {self.mango.id: 5})
+        self.mango.refresh_from_db()
+        self.assertEqual(self.mango.stock, 50)
+
+
+class CancelarConSucursalTests(TestCase):
+    def test_cancelar_regresa_el_stock_a_la_sucursal(self):
+        cache.clear()
+        sucursal = Sucursal.objects.create(nombre="Norte")
+        mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=50)
+        Existencia.objects.create(sucursal=sucursal, producto=mango, stock=1)
+
+        pedido = Pedido.objects.create(
+            nombre="A", telefono="9165551234", direccion_envio="x", sucursal=sucursal,
+        )
+        PedidoItem.objects.create(
+            pedido=pedido, producto=mango, nombre_producto="Mango",
+            precio_unitario=Decimal("2.50"), cantidad=3,
+        )
+
+        self.assertEqual(aplicar_transicion([pedido.id], "CANCELADO"), 1)
+
+        self.assertEqual(Existencia.objects.get(sucursal=sucursal, producto=mango).stock, 4)
+        mango.refresh_from_db()
+        self.assertEqual(mango.stock, 50)
+
+
+class EdicionMasivaPorSucursalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sucursal = Sucursal.objects.create(nombre="Norte")
+        self.mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=50)
+        self.fresa = Producto.objects.create(nombre="Fresa", precio=Decimal("3.00"), stock=50)
+        Existencia.objects.create(sucursal=self.sucursal, producto=self.mango, stock=3)
+
+    def test_vista_previa_cuenta_productos_sin_fila(self):
+        previa = vista_previa(Producto.objects.all(), "STOCK_SUMAR", Decimal("10"), self.sucursal.id)
+        self.assertEqual(previa, {"productos": 2, "stock_antes": 3, "stock_despues": 23})
+
+    def test_aplicar_crea_las_existencias_que_faltan(self):
+        cambio = aplicar(Producto.objects.all(), "STOCK_SUMAR", Decimal("10"), sucursal_id=self.sucursal.id)
+
+        self.assertEqual(cambio.productos, 2)
+        self.assertEqual(
+            dict(Existencia.objects.filter(sucursal=self.sucursal).values_list("producto_id", "stock")),
+            {self.mango.id: 13, self.fresa.id: 10},
+        )
+        self.assertEqual(
+            sorted(Producto.objects.values_list("stock", flat=True)), [50, 50],
+        )
+
+
+@override_settings(EVENTOS_ARCHIVO="")
+@STATIC_SIN_MANIFEST
+class SucursalConcurrenciaTests(TransactionTestCase):
+    def test_checkouts_en_paralelo_no_sobrevenden_la_existencia(self):
+        cache.clear()
+        existencia, intentos = 5, 20
+        producto = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=1000)
+        sucursal = Sucursal.objects.create(nombre="Norte", codigos_postales="77001")
+        Existencia.objects.create(sucursal=sucursal, producto=producto, stock=existencia)
+
+        resultados = _checkouts_en_paralelo(intentos, producto, lambda i: {
+            "nombre": "A",
+            "telefono": f"91655512{i:02d}",
+            "direccion": "123 Calle Falsa, Houston TX 77001",
+        })
+
+        self.assertEqual([status for status, _ in resultados], [200] * intentos)
+        self.assertEqual(sum(ok for _, ok in resultados), existencia)
+        self.assertEqual(Pedido.objects.filter(sucursal=sucursal).count(), existencia)
+        self.assertEqual(Existencia.objects.get(sucursal=sucursal, producto=producto).stock, 0)
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock, 1000)
+
+
+# =========================
+# Embudo
+# =========================
+class EmbudoEventosTests(TestCase):
+    def test_repetir_pedido_cuenta_como_agregar_al_carrito(self):
+        eventos = [
+            ("a", "catalogo_visto"), ("a", "pedido_repetido"),
+            ("a", "checkout_visto"), ("a", "pedido_confirmado"),
+            ("b", "catalogo_visto"),
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            for ts, (visitante, tipo) in enumerate(eventos):
+                f.write(json.dumps({"ts": ts, "tipo": tipo, "visitante": visitante}) + "\n")
+        self.addCleanup(os.remove, f.name)
+
+        salida = StringIO()
+        call_command("embudo_eventos", archivo=f.name, stdout=salida)
+
+        self.assertRegex(salida.getvalue(), r"Confirmaron pedido\s+1\b")
+
+
+# =========================
+# Tickets
+# =========================
+class TicketTests(TestCase):
+    def test_incluye_horario_sucursal_y_promocion(self):
+        sucursal = Sucursal.objects.create(nombre="Norte")
+        horario = HorarioEntrega.objects.create(
+            fecha=timezone.localdate(), inicio=time(12), fin=time(14), capacidad=5,
+        )
+        mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=10)
+        pedido = Pedido.objects.create(
+            nombre="A", telefono="9165551234", direccion_envio="x",
+            horario=horario, sucursal=sucursal,
+            subtotal=Decimal("2.50"), descuento=Decimal("2.50"), total=Decimal("8.50"),
+            envio=Decimal("6.00"),
+        )
+        PedidoItem.objects.create(
+            pedido=pedido, producto=mango, nombre_producto="Mango",
+            precio_unitario=Decimal("2.50"), cantidad=2,
+            descuento=Decimal("2.50"), promocion="2x1 Mango: 2x1 (1 gratis)",
+        )
+
+        texto = render_escpos(datos_ticket(pedido)).decode("cp850")
+
+        self.assertIn("Entrega: ", texto)
+        self.assertIn("12:00-14:00", texto)
+        self.assertIn("Sucursal: Norte", texto)
+        self.assertIn("2x1 Mango: 2x1 (1 gratis)", texto)
+        self.assertRegex(texto, r"2 x Mango\s+\$5\.00")
+        self.assertRegex(texto, r"Descuento\s+-\$2\.50")
+
+    def test_editar_renglones_en_el_admin_regenera_el_ticket(self):
+        mango = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=10)
+        pedido = Pedido.objects.create(nombre="A", telefono="9165551234", direccion_envio="x")
+        item = PedidoItem.objects.create(
+            pedido=pedido, producto=mango, nombre_producto="Mango",
+            precio_unitario=Decimal("2.50"), cantidad=1,
+        )
+        self.assertIn("1 x Mango", bytes(obtener_ticket(pedido.id, "ESCPOS").contenido).decode("cp850"))
+
+        item.cantidad = 4
+        admin.site._registry[PedidoItem].save_model(RequestFactory().post("/"), item, None, True)
+
+        texto = bytes(obtener_ticket(pedido.id, "ESCPOS").contenido).decode("cp850")
+        self.assertIn("4 x Mango", texto)
+        self.assertNotIn("1 x Mango", texto)
+
+
+# =========================
+# Permisos del admin
+# =========================
+def _staff(*codenames):
+    usuario = User.objects.create_user("staff", password="x", is_staff=True)
+    usuario.user_permissions.set(Permission.objects.filter(codename__in=codenames))
+    cliente = Client()
+    cliente.force_login(usuario)
+    return cliente
+
+
+@STATIC_SIN_MANIFEST
+class EdicionMasivaPermisosTests(TestCase):
+    URL = "/admin/productos/producto/edicion-masiva/"
+
+    def setUp(self):
+        cache.clear()
+        self.producto = Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=5)
+        self.datos = {"operacion": "PRECIO_FIJAR", "valor": "0.01", "aplicar": "1"}
+
+    def test_solo_ver_no_puede_aplicar(self):
+        cliente = _staff("view_producto")
+
+        self.assertEqual(cliente.get(self.URL).status_code, 403)
+        self.assertEqual(cliente.post(self.URL, self.datos).status_code, 403)
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio, Decimal("2.50"))
+
+    def test_la_accion_pide_permiso_de_cambio(self):
+        r = _staff("view_producto").get("/admin/productos/producto/")
+        self.assertNotContains(r, "editar_seleccionados")
+
+    def test_stock_de_sucursal_pide_permiso_sobre_existencias(self):
+        sucursal = Sucursal.objects.create(nombre="Norte")
+        cliente = _staff("view_producto", "change_producto")
+
+        r = cliente.post(self.URL, {
+            "operacion": "STOCK_FIJAR", "valor": "0", "sucursal": sucursal.id, "aplicar": "1",
+        })
+        self.assertEqual(r.status_code, 403)
+
+        r = cliente.post(self.URL, self.datos)
+        self.assertEqual(r.status_code, 302)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio, Decimal("0.01"))
+
+
+@STATIC_SIN_MANIFEST
+class ReabastecerPermisosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sucursal = Sucursal.objects.create(nombre="Norte")
+        Producto.objects.create(nombre="Mango", precio=Decimal("2.50"), stock=5)
+        self.url = f"/admin/productos/sucursal/{self.sucursal.id}/reabastecer/"
+        self.datos = {"modo": "fijar", "cantidad": "500"}
+
+    def test_sin_permiso_sobre_existencias_no_reabastece(self):
+        cliente = _staff("view_sucursal", "change_sucursal")
+
+        self.assertEqual(cliente.get(self.url).status_code, 403)
+        self.assertEqual(cliente.post(self.url, self.datos).status_code, 403)
+        self.assertFalse(Existencia.objects.exists())
+
+    def test_con_permiso_reabastece(self):
+        r = _staff("view_sucursal", "change_existencia").post(self.url, self.datos)
+
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(Existencia.objects.get(sucursal=self.sucursal).stock, 500)
+
+
+@STATIC_SIN_MANIFEST
+class GenerarHorariosPermisosTests(TestCase):
+    URL = "/admin/productos/horarioentrega/generar/"
+
+    def setUp(self):
+        cache.clear()
+        self.datos = {"desde": timezone.localdate().isoformat(), "dias": "3", "capacidad": "5"}
+
+    def test_sin_permiso_de_alta_no_genera(self):
+        cliente = _staff("view_horarioentrega")
+
+        self.assertEqual(cliente.get(self.URL).status_code, 403)
+        self.assertEqual(cliente.post(self.URL, self.datos).status_code, 403)
+        self.assertFalse(HorarioEntrega.objects.exists())
+
+    def test_con_permiso_de_alta_genera(self):
+        r = _staff("view_horarioentrega", "add_horarioentrega").post(self.URL, self.datos)
+
+        self.assertEqual(r.status_code, 302)
+        self.assertTrue(HorarioEntrega.objects.exists())
@@ -0,0 +1,219 @@
+"""
+Tickets de cocina/reparto: texto plano para impresora térmica (ESC/POS) y
+PDF. El render es puro (recibe un dict, regresa bytes) para poder usarlo
+desde un pool de procesos en `manage.py renderizar_tickets`.
+"""
+
+import hashlib
+import textwrap
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import Pedido, Ticket
+
+
+ANCHO = 42  # caracteres por línea en papel de 80 mm
+
+# Caracteres que PC850 no tiene (el guion largo de los horarios)
+SIN_PC850 = str.maketrans({"–": "-", "—": "-"})
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+
+# =========================
+# Render (sin base de datos)
+# =========================
+def datos_ticket(pedido: Pedido, items=None) -> dict:
+    datos = pedido.resumen(items)
+    datos["fecha"] = timezone.localtime(pedido.creado_en).strftime("%d/%m/%Y %H:%M")
+    return datos
+
+
+def _renglon(izquierda: str, derecha: str) -> str:
+    espacio = ANCHO - len(derecha) - 1
+    return f"{izquierda[:espacio]:<{espacio}} {derecha}"
+
+
+def _lineas(datos: dict):
+    lineas = [
+        "BOLIS NATURALES".center(ANCHO),
+        f"Pedido #{datos['id']}".center(ANCHO),
+        datos.get("fecha", "").center(ANCHO),
+        "=" * ANCHO,
+        f"Cliente: {datos['nombre']}"[:ANCHO],
+        f"Tel: {datos['telefono']}",
+    ]
+    lineas += textwrap.wrap(f"Dirección: {datos['direccion_envio']}", ANCHO)
+
+    if datos.get("mensaje"):
+        lineas += textwrap.wrap(f"Mensaje: {datos['mensaje']}", ANCHO)
+
+    if datos.get("horario"):
+        lineas.append(f"Entrega: {datos['horario']}"[:ANCHO])
+    if datos.get("sucursal"):
+        lineas.append(f"Sucursal: {datos['sucursal']}"[:ANCHO])
+
+    lineas.append("-" * ANCHO)
+
+    for it in datos["items"]:
+        descuento = Decimal(it.get("descuento") or 0)
+        if not descuento:
+            lineas.append(_renglon(f"{it['cantidad']} x {it['nombre_producto']}", f"${it['subtotal']}"))
+            continue
+
+        # Con promoción: importe sin descuento, la promoción y lo que se descuenta
+        sin_descuento = Decimal(it["subtotal"]) + descuento
+        lineas.append(_renglon(f"{it['cantidad']} x {it['nombre_producto']}", f"${sin_descuento}"))
+        lineas += textwrap.wrap(
+            it.get("promocion") or "Promoción",
+            ANCHO,
+            initial_indent="  ",
+            subsequent_indent="  ",
+        )
+        lineas.append(_renglon("  Descuento", f"-${descuento}"))
+
+    lineas += [
+        "-" * ANCHO,
+        _renglon("Subtotal", f"${datos['subtotal']}"),
+        _renglon("Envío", f"${datos['envio']}"),
+        _renglon("TOTAL", f"${datos['total']}"),
+    ]
+    if Decimal(datos.get("descuento") or 0):
+        lineas.append(_renglon("Ahorraste", f"${datos['descuento']}"))
+
+    lineas += [
+        "",
+        "¡Gracias por tu compra!".center(ANCHO),
+    ]
+    return lineas
+
+
+def render_escpos(datos: dict) -> bytes:
+    lineas = _lineas(datos)
+    cuerpo = "\n".join(lineas[1:]).translate(SIN_PC850).encode("cp850", errors="replace")
+
+    return b"".join([
+        ESC + b"@",            # reset
+        ESC + b"t\x02",        # página de códigos PC850 (acentos y ñ)
+        ESC + b"a\x01",        # centrado
+        ESC + b"E\x01",        # negritas
+        lineas[0].strip().encode("cp850") + b"\n",
+        ESC + b"E\x00",
+        ESC + b"a\x00",        # alineado a la izquierda
+        cuerpo,
+        b"\n\n\n",
+        GS + b"V\x42\x00",     # corte parcial
+    ])
+
+
+def _texto_pdf(linea: str) -> bytes:
+    texto = linea.encode("cp1252", errors="replace")
+    return texto.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def render_pdf(datos: dict) -> bytes:
+    """PDF de una página del ancho del ticket, con Courier (sin dependencias)."""
+    lineas = _lineas(datos)
+    interlineado = 11
+    ancho = 226  # 80 mm en puntos
+    alto = 40 + interlineado * len(lineas)
+
+    contenido = b"BT /F1 8 Tf %d TL 10 %d Td\n" % (interlineado, alto - 20)
+    contenido += b"".join(b"(" + _texto_pdf(linea) + b") '\n" for linea in lineas)
+    contenido += b"ET"
+
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>" % (ancho, alto),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(contenido), contenido),
+    ]
+
+    salida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objetos, start=1):
+        offsets.append(len(salida))
+        salida += b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+
+    xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    salida += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objetos) + 1,
+        xref,
+    )
+    return bytes(salida)
+
+
+RENDERERS = {
+    "ESCPOS": render_escpos,
+    "PDF": render_pdf,
+}
+
+
+def render_pedido(datos: dict):
+    """(pedido_id, estado_version, [(formato, bytes)]). Se usa en el pool de procesos."""
+    return datos["id"], datos["estado_version"], [
+        (formato, render(datos)) for formato, render in RENDERERS.items()
+    ]
+
+
+# =========================
+# Cache en base de datos
+# =========================
+def tickets_para_guardar(renderizados):
+    return [
+        Ticket(
+            pedido_id=pedido_id,
+            estado_version=version,
+            formato=formato,
+            sha256=hashlib.sha256(contenido).hexdigest(),
+            contenido=contenido,
+        )
+        for pedido_id, version, salidas in renderizados
+        for formato, contenido in salidas
+    ]
+
+
+def generar_tickets(pedido_ids):
+    """Renderiza y guarda los tickets de la versión actual de cada pedido."""
+    pedidos = (
+        Pedido.objects.filter(id__in=list(pedido_ids))
+        .select_related("horario", "sucursal")
+        .prefetch_related("items")
+    )
+
+    renderizados = [
+        render_pedido(datos_ticket(p, sorted(p.items.all(), key=lambda it: it.id)))
+        for p in pedidos
+    ]
+    Ticket.objects.bulk_create(tickets_para_guardar(renderizados), ignore_conflicts=True)
+
+
+def descartar_tickets(pedido_ids):
+    """
+    Borra los tickets guardados de pedidos editados en el admin (el ticket
+    se guarda por versión de estado, no por contenido). Se vuelven a
+    renderizar en la siguiente impresión.
+    """
+    Ticket.objects.filter(pedido_id__in=list(pedido_ids)).delete()
+
+
+def obtener_ticket(pedido_id: int, formato: str):
+    """Último ticket guardado; si el pedido nunca se renderizó, lo genera ahora."""
+    qs = (
+        Ticket.objects.filter(pedido_id=pedido_id, formato=formato)
+        .order_by("-estado_version")
+        .only("sha256", "contenido")
+    )
+
+    ticket = qs.first()
+    if ticket is None:
+        generar_tickets([pedido_id])
+        ticket = qs.first()
+
+    return ticket
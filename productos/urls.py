@@ -1,22 +1,27 @@
 from django.urls import path
 from .views import (
     catalogo,
+    elegir_sucursal,
     add_to_cart,
     cart_detail,
     cart_remove,
     cart_update,
+    repetir_pedido,
     checkout,
     pedido_detalle,
     imprimir_pedido,
+    ticket_pedido,
 )
 
 urlpatterns = [
     path("", catalogo, name="catalogo"),
+    path("sucursal/", elegir_sucursal, name="elegir_sucursal"),
 
     path("carrito/", cart_detail, name="cart_detail"),
     path("carrito/agregar/<int:producto_id>/", add_to_cart, name="add_to_cart"),
     path("carrito/quitar/<int:producto_id>/", cart_remove, name="cart_remove"),
     path("carrito/actualizar/<int:producto_id>/", cart_update, name="cart_update"),
+    path("carrito/repetir/", repetir_pedido, name="repetir_pedido"),
 
     path("checkout/", checkout, name="checkout"),
 
@@ -28,4 +33,9 @@ urlpatterns = [
         imprimir_pedido,
         name="imprimir_pedido",
     ),
+    path(
+        "pedido/<int:pedido_id>/ticket/<str:formato>/",
+        ticket_pedido,
+        name="ticket_pedido",
+    ),
 ]
\ No newline at end of file
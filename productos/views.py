@@ -1,9 +1,33 @@
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import CharField, TextField
-
-from .models import Producto, Pedido, PedidoItem
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.template.loader import render_to_string
+
+from .archivo import buscar_archivado
+from .catalogo import productos_catalogo
+from .clientes import (
+    items_ultimo_pedido,
+    normalizar_telefono,
+    obtener_cliente,
+    registrar_pedido,
+)
+from .eventos import emitir
+from .horarios import HORARIOS_REPARTO, disponibles, reservar
+from .models import Cliente, Producto, Pedido, PedidoItem
+from .promociones import Linea, motor
+from .recomendaciones import sugerencias_para
+from .sucursales import (
+    activas as sucursales_activas,
+    descontar,
+    stock_disponible,
+    sucursal_actual,
+    sucursal_por_direccion,
+)
+from .tickets import obtener_ticket
 
 
 # =========================
@@ -38,7 +62,6 @@ def _cart_items_and_total(cart):
     productos = Producto.objects.filter(id__in=ids, activo=True)
 
     items = []
-    subtotal = Decimal("0.00")
 
     for p in productos:
         pid = str(p.id)
@@ -46,20 +69,36 @@ def _cart_items_and_total(cart):
         if qty <= 0:
             continue
 
-        item_subtotal = p.precio * qty
-        subtotal += item_subtotal
-
         items.append({
             "producto": p,
             "qty": qty,
-            "subtotal": item_subtotal,
         })
 
+    # 🏷️ Promociones: una pasada sobre todo el carrito, sin consultas extra
+    descuentos, _ = motor().aplicar(
+        Linea(it["producto"].id, it["producto"].categoria, it["producto"].precio, it["qty"])
+        for it in items
+    )
+
+    subtotal = Decimal("0.00")
+    for it, descuento in zip(items, descuentos):
+        it["descuento"] = descuento.monto
+        it["promocion"] = descuento.explicacion
+        it["subtotal"] = it["producto"].precio * it["qty"] - descuento.monto
+        subtotal += it["subtotal"]
+
     items.sort(key=lambda x: x["producto"].nombre.lower())
 
     return items, subtotal
 
 
+def _stock_en_sucursal(request, producto) -> int:
+    sucursal_id = sucursal_actual(request)
+    if sucursal_id is None:
+        return producto.stock
+    return stock_disponible([producto.id], sucursal_id).get(producto.id, 0)
+
+
 def _calcular_envio_por_subtotal(items, subtotal: Decimal) -> Decimal:
     if not items:
         return Decimal("0.00")
@@ -83,41 +122,46 @@ def _mensaje_envio_por_subtotal(items, subtotal: Decimal) -> str:
 # =========================
 # Catálogo
 # =========================
-def _filter_by_categoria(nombre_categoria: str):
-    field = Producto._meta.get_field("categoria")
-
-    if isinstance(field, (CharField, TextField)):
-        return Producto.objects.filter(
-            categoria__iexact=nombre_categoria,
-            activo=True
-        ).order_by("id")
-
-    return Producto.objects.filter(
-        categoria__nombre__iexact=nombre_categoria,
-        activo=True
-    ).order_by("id")
-
-
 def catalogo(request):
     cart = _get_cart(request.session)
     cart_count = _cart_count(cart)
 
-    agua = _filter_by_categoria("Agua")
-    leche = _filter_by_categoria("Leche")
+    sucursal_id = sucursal_actual(request)
+    productos = productos_catalogo(sucursal_id)
+    agua = productos["agua"]
+    leche = productos["leche"]
 
-    horarios = {
-        "lv": "12:00 pm a 2:00 pm",
-        "sd": "4:00 pm a 6:00 pm",
-    }
+    horarios = HORARIOS_REPARTO
+
+    emitir("catalogo_visto", request)
 
     return render(request, "productos/catalogo.html", {
         "agua": agua,
         "leche": leche,
         "cart_count": cart_count,
         "horarios": horarios,
+        "puede_repetir": bool(request.session.get("cliente_telefono")),
+        "sucursales": sucursales_activas(),
+        "sucursal_id": sucursal_id,
     })
 
 
+def elegir_sucursal(request):
+    if request.method != "POST":
+        return redirect("catalogo")
+
+    try:
+        sucursal_id = int(request.POST.get("sucursal", ""))
+    except ValueError:
+        return redirect("catalogo")
+
+    if any(sid == sucursal_id for sid, _, _ in sucursales_activas()):
+        request.session["sucursal"] = sucursal_id
+        emitir("sucursal_elegida", request, sucursal_id=sucursal_id)
+
+    return redirect("catalogo")
+
+
 # =========================
 # Carrito
 # =========================
@@ -131,12 +175,14 @@ def add_to_cart(request, producto_id):
     pid = str(producto.id)
 
     qty_actual = int(cart.get(pid, {}).get("qty", 0))
+    disponible = _stock_en_sucursal(request, producto)
 
     # No permitir agregar más de lo disponible
-    if qty_actual >= producto.stock:
+    if qty_actual >= disponible:
         request.session["cart_msg"] = (
-            f"Solo hay {producto.stock} unidades disponibles de {producto.nombre}."
+            f"Solo hay {disponible} unidades disponibles de {producto.nombre}."
         )
+        emitir("carrito_sin_stock", request, producto_id=producto.id)
         return redirect("cart_detail")
 
     if pid not in cart:
@@ -147,6 +193,8 @@ def add_to_cart(request, producto_id):
     request.session["cart"] = cart
     request.session.modified = True
 
+    emitir("carrito_agregado", request, producto_id=producto.id, qty=cart[pid]["qty"])
+
     return redirect("cart_detail")
 
 
@@ -179,6 +227,12 @@ def cart_detail(request):
     # ✅ mensaje temporal del carrito
     cart_msg = request.session.pop("cart_msg", "")
 
+    # 💡 "Se compra junto con" (precalculado, una consulta)
+    sugerencias = sugerencias_para(
+        [it["producto"].id for it in items],
+        sucursal_id=sucursal_actual(request),
+    )
+
     return render(request, "productos/carrito.html", {
         "items": items,
         "total": subtotal,
@@ -189,6 +243,7 @@ def cart_detail(request):
         "progreso_pct": progreso_pct,
         "falta": falta,
         "cart_msg": cart_msg,
+        "sugerencias": sugerencias,
     })
 
 
@@ -210,10 +265,11 @@ def cart_update(request, producto_id):
         cart.pop(pid, None)
     else:
         # ✅ No permitir más de lo disponible
-        if qty > producto.stock:
-            qty = producto.stock
+        disponible = _stock_en_sucursal(request, producto)
+        if qty > disponible:
+            qty = disponible
             request.session["cart_msg"] = (
-                f"Solo hay {producto.stock} unidades disponibles de {producto.nombre}. "
+                f"Solo hay {disponible} unidades disponibles de {producto.nombre}. "
                 f"Ajustamos tu carrito."
             )
 
@@ -225,6 +281,8 @@ def cart_update(request, producto_id):
     request.session["cart"] = cart
     request.session.modified = True
 
+    emitir("carrito_actualizado", request, producto_id=producto.id, qty=max(qty, 0))
+
     return redirect("cart_detail")
 
 
@@ -240,6 +298,58 @@ def cart_remove(request, producto_id):
     request.session["cart"] = cart
     request.session.modified = True
 
+    emitir("carrito_quitado", request, producto_id=producto_id)
+
+    return redirect("cart_detail")
+
+
+def repetir_pedido(request):
+    if request.method != "POST":
+        return redirect("catalogo")
+
+    telefono = request.session.get("cliente_telefono", "")
+    if not telefono:
+        return redirect("catalogo")
+
+    cart = _get_cart(request.session)
+    ajustados = []
+
+    ultimo = items_ultimo_pedido(telefono)
+    if not ultimo:
+        # Archivado, cancelado o sin productos activos: no hay qué repetir
+        request.session["cart_msg"] = "No encontramos un pedido anterior que podamos repetir."
+        return redirect("cart_detail")
+
+    sucursal_id = sucursal_actual(request)
+    if sucursal_id is not None:
+        stocks = stock_disponible([pid for pid, _, _ in ultimo], sucursal_id)
+        ultimo = [(pid, cantidad, stocks.get(pid, 0)) for pid, cantidad, _ in ultimo]
+
+    for producto_id, cantidad, stock in ultimo:
+        pid = str(producto_id)
+        qty = int(cart.get(pid, {}).get("qty", 0)) + cantidad
+
+        # ✅ No permitir más de lo disponible
+        if qty > stock:
+            qty = stock
+            ajustados.append(pid)
+
+        if qty <= 0:
+            cart.pop(pid, None)
+            continue
+
+        cart[pid] = {"qty": qty}
+
+    if ajustados:
+        request.session["cart_msg"] = (
+            "Algunos sabores de tu último pedido tienen poco stock. Ajustamos tu carrito."
+        )
+
+    request.session["cart"] = cart
+    request.session.modified = True
+
+    emitir("pedido_repetido", request, ajustados=len(ajustados))
+
     return redirect("cart_detail")
 
 
@@ -256,10 +366,8 @@ def checkout(request):
     envio = _calcular_envio_por_subtotal(items, subtotal)
     total = subtotal + envio
 
-    horarios = {
-    "lv": "12:00 pm a 2:00 pm",
-    "sd": "4:00 pm a 6:00 pm",
-}
+    horarios = HORARIOS_REPARTO
+    entrega = disponibles()
 
     if request.method == "POST":
         nombre = request.POST.get("nombre", "").strip()
@@ -269,88 +377,193 @@ def checkout(request):
 
         # Campos obligatorios
         if not nombre or not telefono_raw or not direccion:
+            emitir("checkout_error", request, motivo="campos")
             return render(request, "productos/checkout.html", {
                 "items": items,
                 "subtotal": subtotal,
                 "envio": envio,
                 "total": total,
                 "horarios": horarios,
+                "entrega": entrega,
                 "error": "Por favor llena nombre, teléfono y dirección.",
             })
 
-        telefono = "".join(ch for ch in telefono_raw if ch.isdigit())
+        telefono = normalizar_telefono(telefono_raw)
 
         if len(telefono) != 10:
+            emitir("checkout_error", request, motivo="telefono")
             return render(request, "productos/checkout.html", {
                 "items": items,
                 "subtotal": subtotal,
                 "envio": envio,
                 "total": total,
                 "horarios": horarios,
+                "entrega": entrega,
                 "error": "El teléfono debe tener exactamente 10 dígitos.",
             })
 
+        # 🏪 Sucursal: la que cubre el CP de la dirección o la que eligió el cliente
+        sucursal_id = sucursal_por_direccion(direccion) or sucursal_actual(request)
+        stocks = stock_disponible([it["producto"].id for it in items], sucursal_id)
+
         # ✅ Validar stock antes de confirmar
         for it in items:
             p = it["producto"]
             qty = it["qty"]
+            disponible = stocks.get(p.id, 0)
 
-            if p.stock < qty:
+            if disponible < qty:
+                emitir("checkout_error", request, motivo="stock", producto_id=p.id)
                 return render(request, "productos/checkout.html", {
                     "items": items,
                     "subtotal": subtotal,
                     "envio": envio,
                     "total": total,
                     "horarios": horarios,
-                    "error": f"No hay suficiente stock de {p.nombre}. Disponible: {p.stock}.",
+                    "entrega": entrega,
+                    "error": f"No hay suficiente stock de {p.nombre}. Disponible: {disponible}.",
                 })
 
-        # 1️⃣ Crear pedido
-        pedido = Pedido.objects.create(
-            nombre=nombre,
-            telefono=telefono,
-            direccion_envio=direccion,
-            mensaje=mensaje,
-            subtotal=subtotal,
-            envio=envio,
-            total=total,
-            estado="CONFIRMADO",
-        )
+        # 🕒 Ventana de entrega (solo si ya se generaron horarios)
+        horario_id = None
+        if entrega["configurado"] and not entrega["opciones"]:
+            # Todos cerrados o llenos: no se aceptan pedidos sin ventana
+            emitir("checkout_error", request, motivo="sin_horarios_disponibles")
+            return render(request, "productos/checkout.html", {
+                "items": items,
+                "subtotal": subtotal,
+                "envio": envio,
+                "total": total,
+                "horarios": horarios,
+                "entrega": entrega,
+                "error": "Por ahora no hay horarios de entrega disponibles. Intenta más tarde.",
+            })
 
-        # 2️⃣ Crear items y descontar stock
-        for it in items:
-            p = it["producto"]
-            qty = it["qty"]
-            sub = it["subtotal"]
-
-            PedidoItem.objects.create(
-                pedido=pedido,
-                producto=p,
-                nombre_producto=p.nombre,
-                precio_unitario=p.precio,
-                cantidad=qty,
-                subtotal=sub,
+        if entrega["configurado"]:
+            try:
+                horario_id = int(request.POST.get("horario", ""))
+            except ValueError:
+                horario_id = None
+
+            if horario_id is None:
+                emitir("checkout_error", request, motivo="sin_horario")
+                return render(request, "productos/checkout.html", {
+                    "items": items,
+                    "subtotal": subtotal,
+                    "envio": envio,
+                    "total": total,
+                    "horarios": horarios,
+                    "entrega": entrega,
+                    "error": "Elige un horario de entrega.",
+                })
+
+        cliente = obtener_cliente(telefono, nombre, direccion)
+
+        with transaction.atomic():
+            if horario_id is not None and not reservar(horario_id):
+                emitir("checkout_error", request, motivo="horario_lleno")
+                return render(request, "productos/checkout.html", {
+                    "items": items,
+                    "subtotal": subtotal,
+                    "envio": envio,
+                    "total": total,
+                    "horarios": horarios,
+                    "entrega": disponibles(),
+                    "error": "Ese horario ya se llenó. Por favor elige otro.",
+                })
+
+            # 1️⃣ Crear pedido
+            pedido = Pedido.objects.create(
+                cliente=cliente,
+                nombre=nombre,
+                telefono=telefono,
+                direccion_envio=direccion,
+                mensaje=mensaje,
+                subtotal=subtotal,
+                descuento=sum((it["descuento"] for it in items), Decimal("0.00")),
+                envio=envio,
+                total=total,
+                estado="CONFIRMADO",
+                horario_id=horario_id,
+                sucursal_id=sucursal_id,
+            )
+
+            # 2️⃣ Crear items y descontar stock
+            renglones = []
+            for it in items:
+                p = it["producto"]
+                qty = it["qty"]
+
+                renglones.append(PedidoItem.objects.create(
+                    pedido=pedido,
+                    producto=p,
+                    nombre_producto=p.nombre,
+                    precio_unitario=p.precio,
+                    cantidad=qty,
+                    descuento=it["descuento"],
+                    promocion=it["promocion"],
+                ))
+
+            # UPDATE condicional contra las existencias de la sucursal (o Producto.stock)
+            faltante = descontar(
+                sucursal_id,
+                {it["producto"].id: it["qty"] for it in items},
             )
+            if faltante is not None:
+                transaction.set_rollback(True)
+                emitir("checkout_error", request, motivo="stock", producto_id=faltante)
+                return render(request, "productos/checkout.html", {
+                    "items": items,
+                    "subtotal": subtotal,
+                    "envio": envio,
+                    "total": total,
+                    "horarios": horarios,
+                    "entrega": entrega,
+                    "error": "Se acaba de agotar uno de tus productos. Revisa tu carrito.",
+                })
+
+            registrar_pedido(cliente, pedido)
 
-            p.stock -= qty
-            p.save()
+            # 📸 Copia para la página de seguimiento
+            pedido.guardar_resumen(renglones)
 
-        # 3️⃣ Limpiar carrito
+        # 3️⃣ Limpiar carrito (y recordar al cliente para "repetir pedido")
         request.session.pop("cart", None)
+        request.session["cliente_telefono"] = telefono
+        if sucursal_id is not None:
+            request.session["sucursal"] = sucursal_id
         request.session.modified = True
 
+        emitir(
+            "pedido_confirmado",
+            request,
+            pedido_id=pedido.id,
+            total=pedido.total,
+            descuento=pedido.descuento,
+        )
+
         # 4️⃣ Confirmación
         return render(request, "productos/confirmacion.html", {
             "pedido": pedido,
             "horarios": horarios,
         })
 
+    # Cliente que ya compró desde este navegador: precargar sus datos
+    cliente = None
+    telefono_sesion = request.session.get("cliente_telefono")
+    if telefono_sesion:
+        cliente = Cliente.objects.filter(telefono=telefono_sesion).first()
+
+    emitir("checkout_visto", request, items=len(items), subtotal=subtotal)
+
     return render(request, "productos/checkout.html", {
         "items": items,
         "subtotal": subtotal,
         "envio": envio,
         "total": total,
         "horarios": horarios,
+        "entrega": entrega,
+        "cliente": cliente,
         "error": "",
     })
 
@@ -358,16 +571,66 @@ def checkout(request):
 # =========================
 # Estado del pedido
 # =========================
+PAGINA_ESTADO_TTL = 300
+
+
 def pedido_detalle(request, pedido_id):
     token = request.GET.get("t", "").strip()
 
-    pedido = get_object_or_404(Pedido, id=pedido_id, token=token)
-    items = PedidoItem.objects.filter(pedido=pedido).order_by("id")
+    # Una lectura por PK: el estado vigente + la copia guardada al confirmar
+    fila = (
+        Pedido.objects.filter(id=pedido_id, token=token)
+        .values_list("estado", "resumen_datos")
+        .first()
+    ) if token else None
+
+    if fila is None:
+        # Pedidos viejos viven en el archivo (ver archivar_pedidos)
+        datos = buscar_archivado(pedido_id, token)
+        if datos is None:
+            raise Http404("Pedido no encontrado")
+
+        return HttpResponse(_pagina_estado(request, datos))
 
-    return render(request, "productos/estado_pedido.html", {
+    estado, datos = fila
+    if datos is None:
+        # Pedidos de antes de la copia: se genera una vez
+        datos = Pedido.objects.get(id=pedido_id).guardar_resumen()
+
+    # La página solo cambia con el estado o con una copia nueva (edición en admin)
+    clave = f"pedido:pagina:{pedido_id}:{estado}:{datos.get('copia')}"
+    html = cache.get(clave)
+    if html is None:
+        html = _pagina_estado(request, {**datos, "estado": estado})
+        cache.set(clave, html, PAGINA_ESTADO_TTL)
+
+    return HttpResponse(html)
+
+
+def _pagina_estado(request, datos: dict) -> str:
+    pedido = _resumen_para_plantilla(datos)
+
+    return render_to_string("productos/estado_pedido.html", {
         "pedido": pedido,
-        "items": items,
-    })
+        "items": pedido["items"],
+    }, request=request)
+
+
+MONTOS_RESUMEN = ("subtotal", "descuento", "envio", "total", "precio_unitario")
+
+
+def _montos_a_decimal(datos: dict) -> dict:
+    return {
+        k: Decimal(v) if k in MONTOS_RESUMEN and v is not None else v
+        for k, v in datos.items()
+    }
+
+
+def _resumen_para_plantilla(datos: dict) -> dict:
+    # Los montos viajan como texto en el JSON; "0.00" no debe contar como descuento
+    pedido = _montos_a_decimal(datos)
+    pedido["items"] = [_montos_a_decimal(it) for it in datos.get("items", [])]
+    return pedido
 
 def imprimir_pedido(request, pedido_id):
     pedido = get_object_or_404(Pedido, id=pedido_id)
@@ -380,4 +643,32 @@ def imprimir_pedido(request, pedido_id):
             "pedido": pedido,
             "items": items,
         },
-    )
\ No newline at end of file
+    )
+
+
+TICKET_FORMATOS = {
+    "escpos": ("ESCPOS", "application/octet-stream", "bin"),
+    "pdf": ("PDF", "application/pdf", "pdf"),
+}
+
+
+@staff_member_required
+def ticket_pedido(request, pedido_id, formato):
+    if formato not in TICKET_FORMATOS:
+        raise Http404("Formato no disponible")
+
+    codigo, content_type, extension = TICKET_FORMATOS[formato]
+
+    if not Pedido.objects.filter(id=pedido_id).exists():
+        raise Http404("Pedido no encontrado")
+
+    ticket = obtener_ticket(pedido_id, codigo)
+
+    etag = f'"{ticket.sha256}"'
+    if request.headers.get("If-None-Match") == etag:
+        return HttpResponseNotModified()
+
+    response = HttpResponse(bytes(ticket.contenido), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="pedido-{pedido_id}.{extension}"'
+    response["ETag"] = etag
+    return response